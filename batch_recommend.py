@@ -0,0 +1,73 @@
+"""
+Description: Offline Batch Recommendation Job
+
+
+This script precomputes recommendations for the whole catalog (or a list of movie ids)
+and streams them to a CSV, JSONL or Parquet file, e.g. to feed a CDN or an email system.
+It uses a persisted model when one is available and builds it from the CSV otherwise.
+
+Example:
+    python batch_recommend.py recommendations.csv --top-n 10
+"""
+
+import argparse
+import os
+
+# Import the movie recommendation system
+from movie_recommendation_system import MovieRecommendationSystem
+
+def run_batch_job(output_path, csv_path='movies_metadata.csv', artifact_path='model_artifact',
+                  movie_ids=None, top_n=10, chunk_size=1024, n_jobs=-1):
+    """
+    Generate top-N recommendations for many movies and write them to output_path.
+
+    Parameters:
+    -----------
+    output_path : str
+        File to write (.csv, .jsonl or .parquet)
+    csv_path : str, default='movies_metadata.csv'
+        Path to the movie metadata CSV file, used when no artifact exists
+    artifact_path : str, default='model_artifact'
+        Directory of a persisted model
+    movie_ids : list of int, optional
+        Movie ids (row positions) to process. Defaults to the whole catalog.
+    top_n : int, default=10
+        Number of recommendations per movie
+    chunk_size : int, default=1024
+        Number of movies scored per task
+    n_jobs : int, default=-1
+        Number of worker processes (-1 uses all cores)
+
+    Returns:
+    --------
+    dict
+        The job summary, including throughput in movies per second
+    """
+    if os.path.exists(os.path.join(artifact_path, 'manifest.json')):
+        recommender = MovieRecommendationSystem.load(artifact_path)
+    else:
+        recommender = MovieRecommendationSystem()
+        recommender.data_ingestion(csv_path)
+        recommender.preprocessing_pipeline()
+        recommender.similarity_engine(similarity_mode='on_demand')
+        recommender.save(artifact_path)
+
+    return recommender.batch_recommendations(
+        output_path, movie_ids=movie_ids, top_n=top_n, chunk_size=chunk_size, n_jobs=n_jobs
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute movie recommendations in batch.")
+    parser.add_argument('output_path', help="Output file (.csv, .jsonl or .parquet)")
+    parser.add_argument('--csv-path', default='movies_metadata.csv')
+    parser.add_argument('--artifact-path', default='model_artifact')
+    parser.add_argument('--movie-ids', type=int, nargs='+', help="Movie ids to process (default: all)")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    run_batch_job(args.output_path, csv_path=args.csv_path, artifact_path=args.artifact_path,
+                  movie_ids=args.movie_ids, top_n=args.top_n, chunk_size=args.chunk_size,
+                  n_jobs=args.n_jobs)
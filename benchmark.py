@@ -0,0 +1,502 @@
+"""
+Description: Offline Evaluation and Benchmark Harness
+
+
+This script measures the ranking quality and speed of several engine configurations
+(on-demand scoring, neighbor table, ANN index, quantized embeddings, hybrid) on the same
+catalog and the same seed movies, and writes a JSON report that can be diffed between runs.
+
+Ranking quality is measured against held-out users of the MovieLens ratings: a random
+share of the users is left out of collaborative training, and for each sampled held-out
+user one of the movies they liked is the seed and the other movies they liked are the
+relevant results (precision, recall and NDCG at k). Genre overlap, rating difference and
+content relevance come from evaluation_framework. Each configuration is built and queried
+in a fresh process, so its build time and peak memory are measured on their own.
+
+Example:
+    python benchmark.py --ratings-path ratings.csv --links-path links.csv --output benchmark_report.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# The ranking threads run their own matrix products, so keep BLAS single-threaded
+# to avoid oversubscribing the cores (must be set before numpy is imported)
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+# Import the movie recommendation system
+from movie_recommendation_system import MovieRecommendationSystem, CollaborativeFilteringModel, _peak_rss_mb
+
+# Engine configurations: similarity_engine() arguments, followed by the optional build steps
+CONFIGURATIONS = {
+    'dense': {'similarity_engine': {'similarity_mode': 'dense', 'dtype': 'float32'}},
+    'on_demand': {'similarity_engine': {'similarity_mode': 'on_demand'}},
+    'neighbors': {'similarity_engine': {'similarity_mode': 'on_demand'}, 'neighbor_table': {'k': 100}},
+    'ann': {'similarity_engine': {'similarity_mode': 'on_demand'}, 'ann_index': {'n_probe': 8}},
+    'int8': {'similarity_engine': {'similarity_mode': 'on_demand'},
+             'quantize_embeddings': {'precision': 'int8', 'rerank_candidates': 100}},
+    'hybrid': {'similarity_engine': {'similarity_mode': 'on_demand'},
+               'hybrid_engine': {'collaborative_weight': 0.3, 'n_candidates': 100}}
+}
+
+# The dense N x N matrix needs ~8 GB at 45k movies, so it is only run on request
+DEFAULT_CONFIGURATIONS = ('on_demand', 'neighbors', 'ann', 'int8', 'hybrid')
+
+# Build steps run after similarity_engine(), in this order
+BUILD_STEPS = ('neighbor_table', 'ann_index', 'quantize_embeddings', 'hybrid_engine')
+
+# Report fields compared by compare_reports()
+COMPARED_SECTIONS = ('build', 'latency_ms', 'quality')
+
+def held_out_queries(recommender, cf_model, holdout_fraction=0.2, min_rating=4.0, n_queries=2000,
+                     random_state=0):
+    """
+    Split off held-out users and sample one (user, seed movie) query per user.
+
+    Parameters:
+    -----------
+    recommender : MovieRecommendationSystem
+        The preprocessed catalog
+    cf_model : CollaborativeFilteringModel
+        A model with ratings and TMDB links loaded. Its ratings are replaced by
+        those of the remaining (training) users.
+    holdout_fraction : float, default=0.2
+        Share of the users held out
+    min_rating : float, default=4.0
+        Ratings at or above this value count as liked (relevant) movies
+    n_queries : int, default=2000
+        Number of held-out users sampled as queries
+    random_state : int, default=0
+        Seed of the split and of the sampling
+
+    Returns:
+    --------
+    dict
+        The query users and seeds (catalog row positions) and the sorted
+        user * n_movies + row keys of the liked movies of each query user
+    """
+    rng = np.random.default_rng(random_state)
+    held_out = rng.random(cf_model.ratings.shape[0]) < holdout_fraction
+
+    # Catalog row of every MovieLens movie, or -1 when it is not in the catalog
+    linked = cf_model.tmdb_ids >= 0
+    rows = pd.Series(np.arange(len(recommender.movies_df)),
+                     index=pd.to_numeric(recommender.movies_df['id'], errors='coerce').fillna(-1).astype(np.int64))
+    rows = rows[~rows.index.duplicated()]
+    catalog_rows = np.full(len(cf_model.movie_ids), -1, dtype=np.int64)
+    catalog_rows[linked] = rows.reindex(cf_model.tmdb_ids[linked]).fillna(-1).to_numpy(dtype=np.int64)
+
+    held_out_ratings = cf_model.ratings[np.flatnonzero(held_out)]
+    cf_model.ratings = cf_model.ratings[np.flatnonzero(~held_out)]
+    cf_model.user_ids = cf_model.user_ids[~held_out]
+
+    # Liked catalog movies of every held-out user, as sorted user * n_movies + row keys
+    n_movies = len(recommender.movies_df)
+    users = np.repeat(np.arange(held_out_ratings.shape[0], dtype=np.int64), np.diff(held_out_ratings.indptr))
+    movie_rows = catalog_rows[held_out_ratings.indices]
+    keep = (held_out_ratings.data >= min_rating) & (movie_rows >= 0)
+    liked_keys = np.unique(users[keep] * n_movies + movie_rows[keep])
+
+    # Users need a seed and at least one other liked movie
+    counts = np.bincount(liked_keys // n_movies, minlength=held_out_ratings.shape[0])
+    eligible = np.flatnonzero(counts >= 2)
+    query_users = np.sort(rng.choice(eligible, min(n_queries, len(eligible)), replace=False))
+    starts = np.searchsorted(liked_keys, query_users * n_movies)
+    seeds = liked_keys[starts + rng.integers(counts[query_users])] % n_movies
+
+    print(f"Held out {held_out.sum()} users; sampled {len(query_users)} queries "
+          f"on {len(np.unique(seeds))} seed movies.")
+    return {
+        'users': query_users,
+        'seeds': seeds,
+        'liked_keys': liked_keys,
+        'held_out_users': int(held_out.sum())
+    }
+
+def ranking_metrics(recommendations, users, liked_keys, n_movies, k):
+    """
+    Compute precision, recall, NDCG and hit rate at k for held-out queries.
+
+    The relevant movies of a query are the movies its user liked, other than the seed.
+
+    Parameters:
+    -----------
+    recommendations : numpy.ndarray
+        (n_queries, k) catalog row positions recommended for each query, padded with -1
+    users : numpy.ndarray
+        The user of each query
+    liked_keys : numpy.ndarray
+        Sorted user * n_movies + row keys of the liked movies
+    n_movies : int
+        Number of movies in the catalog
+    k : int
+        Cutoff of the metrics
+
+    Returns:
+    --------
+    dict
+        The metrics averaged over the queries
+    """
+    keys = users[:, None] * n_movies + recommendations
+    hits = np.isin(keys, liked_keys) & (recommendations >= 0)
+
+    # The seed itself is liked but can never be recommended
+    n_relevant = (np.searchsorted(liked_keys, (users + 1) * n_movies)
+                  - np.searchsorted(liked_keys, users * n_movies) - 1)
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+
+    n_hits = hits.sum(axis=1)
+    return {
+        f'precision_at_{k}': float((n_hits / k).mean()),
+        f'recall_at_{k}': float((n_hits / n_relevant).mean()),
+        f'ndcg_at_{k}': float(((hits * discounts).sum(axis=1) / ideal).mean()),
+        f'hit_rate_at_{k}': float((n_hits > 0).mean())
+    }
+
+def run_configuration(recommender, name, configuration, seeds, k=10, n_latency_queries=500, n_jobs=-1,
+                      cf_model=None):
+    """
+    Build one engine configuration, then rank every seed movie with it.
+
+    Meant to run in its own process, so that peak_rss_mb covers this
+    configuration only.
+
+    Parameters:
+    -----------
+    recommender : MovieRecommendationSystem
+        A preprocessed recommendation system
+    name : str
+        Name of the configuration in the report
+    configuration : dict
+        Keyword arguments of similarity_engine() and of each build step used
+    seeds : numpy.ndarray
+        Distinct seed movies (catalog row positions)
+    k : int, default=10
+        Number of recommendations per seed
+    n_latency_queries : int, default=500
+        Number of seeds timed one at a time for the latency percentiles
+    n_jobs : int, default=-1
+        Number of ranking threads in the throughput and quality passes
+    cf_model : CollaborativeFilteringModel, optional
+        Fitted model used by the hybrid_engine step
+
+    Returns:
+    --------
+    dict
+        The report of the configuration and the (n_seeds, k) recommendations
+    """
+    print(f"Building configuration '{name}'...")
+    start_time = time.perf_counter()
+    recommender.similarity_engine(**configuration['similarity_engine'])
+    for step in BUILD_STEPS:
+        if step in configuration:
+            arguments = dict(configuration[step])
+            if step == 'hybrid_engine':
+                arguments['cf_model'] = cf_model
+            getattr(recommender, step)(**arguments)
+    build = {
+        'seconds': time.perf_counter() - start_time,
+        'peak_rss_mb': _peak_rss_mb(),
+        'model_mb': sum(
+            array.nbytes for array in [recommender.cosine_sim, recommender.normalized_features,
+                                       recommender.neighbor_indices, recommender.neighbor_scores,
+                                       recommender.collaborative_features]
+            if array is not None
+        ) / (1024 * 1024)
+    }
+    if recommender.embedding_store is not None:
+        build['model_mb'] += recommender.embedding_store.nbytes / (1024 * 1024)
+    if recommender.svd_report is not None:
+        build['svd_seconds'] = recommender.svd_report['seconds']
+        build['n_components'] = recommender.svd_report['n_components']
+
+    # Every query is ranked from scratch
+    recommender.result_cache = None
+    recommender._evaluation_features()
+
+    def rank(chunk):
+        recommendations = np.full((len(chunk), k), -1, dtype=np.int64)
+        for i, idx in enumerate(chunk):
+            movie_indices, _ = recommender._rank_similar(idx, k)
+            recommendations[i, :len(movie_indices)] = movie_indices
+        return recommendations
+
+    def evaluate(chunk, recommendations):
+        metrics = []
+        for idx, row in zip(chunk, recommendations):
+            row = row[row >= 0]
+            metrics.append(recommender.evaluation_framework(recommender.movies_df.iloc[row], idx, row))
+        return metrics
+
+    n_chunks = min(len(seeds), 8 * (os.cpu_count() if n_jobs == -1 else n_jobs))
+    chunks = np.array_split(seeds, n_chunks)
+
+    print(f"Ranking {len(seeds)} seed movies...")
+    start_time = time.perf_counter()
+    recommendations = np.vstack(Parallel(n_jobs=n_jobs, prefer='threads')(delayed(rank)(chunk) for chunk in chunks))
+    throughput = len(seeds) / (time.perf_counter() - start_time)
+
+    latencies = []
+    for idx in seeds[:n_latency_queries]:
+        query_start = time.perf_counter()
+        recommender._rank_similar(idx, k)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+
+    chunk_recommendations = np.split(recommendations, np.cumsum([len(chunk) for chunk in chunks])[:-1])
+    content_metrics = [
+        metrics for chunk_metrics in Parallel(n_jobs=n_jobs, prefer='threads')(
+            delayed(evaluate)(chunk, rows) for chunk, rows in zip(chunks, chunk_recommendations)
+        )
+        for metrics in chunk_metrics
+    ]
+    quality = {
+        metric: float(np.mean([metrics[metric] for metrics in content_metrics]))
+        for metric in content_metrics[0]
+    }
+    quality['catalog_coverage'] = len(np.unique(recommendations[recommendations >= 0])) / len(recommender.movies_df)
+
+    build['peak_rss_mb'] = _peak_rss_mb()
+    print(f"'{name}': p50 {np.percentile(latencies, 50):.2f} ms, {throughput:.0f} queries/s.")
+    return {
+        'settings': configuration,
+        'build': build,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)),
+            'p99': float(np.percentile(latencies, 99)),
+            'mean': float(np.mean(latencies))
+        },
+        'throughput_qps': throughput,
+        'quality': quality
+    }, recommendations
+
+def compare_reports(baseline, report):
+    """
+    List the changes of every measured value between two benchmark reports.
+
+    Parameters:
+    -----------
+    baseline : dict
+        The earlier report
+    report : dict
+        The new report
+
+    Returns:
+    --------
+    list of dict
+        One entry per configuration and value present in both reports, with
+        the baseline value, the new value and the relative change
+    """
+    changes = []
+    for name, results in report['configurations'].items():
+        if name not in baseline['configurations']:
+            continue
+        previous = baseline['configurations'][name]
+        fields = [('throughput_qps', previous.get('throughput_qps'), results.get('throughput_qps'))]
+        for section in COMPARED_SECTIONS:
+            for field, value in results.get(section, {}).items():
+                fields.append((f'{section}.{field}', previous.get(section, {}).get(field), value))
+        for field, old, new in fields:
+            if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+                changes.append({
+                    'configuration': name,
+                    'field': field,
+                    'baseline': old,
+                    'value': new,
+                    'change': (new - old) / abs(old) if old else None
+                })
+    return changes
+
+def run_benchmark(csv_path='movies_metadata.csv', ratings_path='ratings.csv', links_path='links.csv',
+                  output_path='benchmark_report.json', configurations=DEFAULT_CONFIGURATIONS, n_components=2000,
+                  n_queries=2000, k=10, n_latency_queries=500, holdout_fraction=0.2, min_rating=4.0,
+                  cf_factors=64, cf_iterations=15, n_jobs=-1, random_state=0):
+    """
+    Benchmark engine configurations and write the report to output_path.
+
+    Parameters:
+    -----------
+    csv_path : str, default='movies_metadata.csv'
+        Path to the movie metadata CSV file
+    ratings_path : str, default='ratings.csv'
+        Path to the ratings CSV file. Without it (or without links_path), seeds
+        are sampled from the catalog, only the content metrics are reported and
+        the hybrid configuration is skipped.
+    links_path : str, default='links.csv'
+        Path to the links CSV file mapping MovieLens movie ids to TMDB ids
+    output_path : str, default='benchmark_report.json'
+        File to write the JSON report to
+    configurations : list of str, default=DEFAULT_CONFIGURATIONS
+        Names of the configurations to run (keys of CONFIGURATIONS)
+    n_components : int, default=2000
+        Number of SVD components of every configuration
+    n_queries : int, default=2000
+        Number of queries (held-out users, or catalog seeds without ratings)
+    k : int, default=10
+        Number of recommendations per query
+    n_latency_queries : int, default=500
+        Number of seeds timed one at a time for the latency percentiles
+    holdout_fraction : float, default=0.2
+        Share of the users held out of collaborative training
+    min_rating : float, default=4.0
+        Ratings at or above this value count as relevant
+    cf_factors : int, default=64
+        Latent factors of the collaborative model used by 'hybrid'
+    cf_iterations : int, default=15
+        ALS iterations of the collaborative model used by 'hybrid'
+    n_jobs : int, default=-1
+        Number of ranking threads (-1 uses all cores)
+    random_state : int, default=0
+        Seed of the held-out split and of the query sampling
+
+    Returns:
+    --------
+    dict
+        The report
+    """
+    unknown = [name for name in configurations if name not in CONFIGURATIONS]
+    if unknown:
+        raise ValueError(f"Unknown configurations: {unknown} (expected any of {list(CONFIGURATIONS)})")
+
+    # A fresh process per configuration keeps the peak memory of each one separate. A child
+    # starts with the resident size of the process it is forked from, so configurations are
+    # forked from a server started now, before any data is loaded (spawn where unavailable).
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        multiprocessing.forkserver.ensure_running()
+    else:
+        context = multiprocessing.get_context('spawn')
+
+    recommender = MovieRecommendationSystem()
+    recommender.data_ingestion(csv_path)
+    recommender.preprocessing_pipeline()
+    n_movies = len(recommender.movies_df)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {
+            'csv_path': csv_path,
+            'ratings_path': ratings_path,
+            'n_components': n_components,
+            'n_queries': n_queries,
+            'k': k,
+            'n_latency_queries': n_latency_queries,
+            'holdout_fraction': holdout_fraction,
+            'min_rating': min_rating,
+            'n_jobs': n_jobs,
+            'random_state': random_state
+        },
+        'pipeline': {
+            'ingestion': recommender.ingestion_report,
+            'preprocessing': recommender.preprocessing_report
+        },
+        'configurations': {}
+    }
+
+    cf_model = None
+    queries = None
+    if os.path.exists(ratings_path) and links_path is not None and os.path.exists(links_path):
+        cf_model = CollaborativeFilteringModel(factors=cf_factors, iterations=cf_iterations, n_jobs=n_jobs)
+        cf_model.load_ratings(ratings_path)
+        cf_model.load_links(links_path)
+        queries = held_out_queries(recommender, cf_model, holdout_fraction=holdout_fraction,
+                                   min_rating=min_rating, n_queries=n_queries, random_state=random_state)
+        report['pipeline']['ratings'] = cf_model.load_report
+        seeds, seed_of_query = np.unique(queries['seeds'], return_inverse=True)
+        report['dataset'] = {
+            'n_movies': n_movies,
+            'held_out_users': queries['held_out_users'],
+            'queries': len(queries['users']),
+            'seed_movies': len(seeds)
+        }
+
+        if 'hybrid' in configurations:
+            # Only the movie factors are used by hybrid_engine()
+            cf_model.fit()
+            cf_model.ratings = None
+            cf_model.user_factors = None
+            report['pipeline']['collaborative_training'] = cf_model.training_report
+    else:
+        print("No ratings or links found; reporting content metrics only.")
+        seeds = np.sort(np.random.default_rng(random_state).choice(n_movies, min(n_queries, n_movies), replace=False))
+        report['dataset'] = {'n_movies': n_movies, 'queries': len(seeds), 'seed_movies': len(seeds)}
+        configurations = [name for name in configurations if name != 'hybrid']
+
+    # Query threads would share the cache; it is also not picklable
+    recommender.result_cache = None
+
+    for name in configurations:
+        configuration = json.loads(json.dumps(CONFIGURATIONS[name]))
+        configuration['similarity_engine'].setdefault('n_components', n_components)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results, recommendations = executor.submit(
+                run_configuration, recommender, name, configuration, seeds, k=k,
+                n_latency_queries=n_latency_queries, n_jobs=n_jobs,
+                cf_model=cf_model if name == 'hybrid' else None
+            ).result()
+        if queries is not None:
+            results['quality'].update(ranking_metrics(
+                recommendations[seed_of_query], queries['users'],
+                queries['liked_keys'], n_movies, k
+            ))
+        report['configurations'][name] = results
+
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Benchmark report written to {output_path}.")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ranking quality and speed of engine configurations.")
+    parser.add_argument('--csv-path', default='movies_metadata.csv')
+    parser.add_argument('--ratings-path', default='ratings.csv')
+    parser.add_argument('--links-path', default='links.csv')
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--configurations', nargs='+', choices=list(CONFIGURATIONS),
+                        default=list(DEFAULT_CONFIGURATIONS))
+    parser.add_argument('--n-components', type=int, default=2000)
+    parser.add_argument('--n-queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-latency-queries', type=int, default=500)
+    parser.add_argument('--holdout-fraction', type=float, default=0.2)
+    parser.add_argument('--min-rating', type=float, default=4.0)
+    parser.add_argument('--cf-factors', type=int, default=64)
+    parser.add_argument('--cf-iterations', type=int, default=15)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--random-state', type=int, default=0)
+    parser.add_argument('--baseline', help="Earlier report to compare the results with")
+    args = parser.parse_args()
+
+    report = run_benchmark(csv_path=args.csv_path, ratings_path=args.ratings_path, links_path=args.links_path,
+                           output_path=args.output, configurations=args.configurations,
+                           n_components=args.n_components, n_queries=args.n_queries, k=args.k,
+                           n_latency_queries=args.n_latency_queries, holdout_fraction=args.holdout_fraction,
+                           min_rating=args.min_rating, cf_factors=args.cf_factors,
+                           cf_iterations=args.cf_iterations, n_jobs=args.n_jobs, random_state=args.random_state)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for change in compare_reports(baseline, report):
+            relative = f"{change['change']:+.1%}" if change['change'] is not None else 'n/a'
+            print(f"{change['configuration']:>10} {change['field']:<32} "
+                  f"{change['baseline']:>12.4g} -> {change['value']:>12.4g} ({relative})")
@@ -10,10 +10,12 @@ Run this after setting up the recommendation system to quickly test recommendati
 different movies.
 """
 
+import os
+
 # Import the movie recommendation system
 from movie_recommendation_system import MovieRecommendationSystem
 
-def run_interactive_mode(csv_path='movies_metadata.csv'):
+def run_interactive_mode(csv_path='movies_metadata.csv', artifact_path='model_artifact'):
     """
     Run an interactive session for testing movie recommendations.
     
@@ -21,16 +23,24 @@ def run_interactive_mode(csv_path='movies_metadata.csv'):
     -----------
     csv_path : str, default='movies_metadata.csv'
         Path to the movie metadata CSV file
+    artifact_path : str, default='model_artifact'
+        Directory of a persisted model. It is loaded if present, otherwise the
+        model is built from csv_path and saved there.
     """
     print("Initializing Movie Recommendation System...")
     
-    # Create and initialize the recommendation system
-    recommender = MovieRecommendationSystem()
-    
-    # Load and process the data
-    recommender.data_ingestion(csv_path)
-    recommender.preprocessing_pipeline()
-    recommender.similarity_engine()
+    if os.path.exists(os.path.join(artifact_path, 'manifest.json')):
+        # Memory-map the persisted model instead of rebuilding it
+        recommender = MovieRecommendationSystem.load(artifact_path)
+    else:
+        # Create and initialize the recommendation system
+        recommender = MovieRecommendationSystem()
+        
+        # Load and process the data
+        recommender.data_ingestion(csv_path)
+        recommender.preprocessing_pipeline()
+        recommender.similarity_engine(similarity_mode='on_demand')
+        recommender.save(artifact_path)
     
     print("\nMovie Recommendation System is ready!")
     print("----------------------------------------")
@@ -1,7 +1,12 @@
 # app.py
 from flask import Flask, request, render_template, jsonify
-from movie_recommendation_system import MovieRecommendationSystem
+from movie_recommendation_system import MovieRecommendationSystem, CollaborativeFilteringModel, StageProfiler
+from visualization_cache import VisualizationCache
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import os
+import re
+import threading
 import time
 
 app = Flask(__name__)
@@ -10,25 +15,226 @@ app = Flask(__name__)
 movie_recommender = MovieRecommendationSystem()
 model_ready = False
 
+# Directory of the persisted model artifact (see MovieRecommendationSystem.save)
+MODEL_ARTIFACT_PATH = os.environ.get('MODEL_ARTIFACT_PATH', 'model_artifact')
+
+# Directory of the optional collaborative filtering artifact (see train_collaborative.py)
+CF_ARTIFACT_PATH = os.environ.get('CF_ARTIFACT_PATH', 'cf_artifact')
+cf_model = None
+
+# Weight of the collaborative similarity in /recommend rankings (0 keeps them content-only)
+HYBRID_WEIGHT = float(os.environ.get('HYBRID_WEIGHT', 0))
+
+# Pipeline stage records are logged as JSON lines to this file ('-' for stderr) when set
+PROFILE_LOG_PATH = os.environ.get('PROFILE_LOG_PATH')
+if PROFILE_LOG_PATH:
+    profile_handler = logging.StreamHandler() if PROFILE_LOG_PATH == '-' else logging.FileHandler(PROFILE_LOG_PATH)
+    profile_handler.setFormatter(logging.Formatter('%(message)s'))
+    StageProfiler.logger.addHandler(profile_handler)
+    StageProfiler.logger.setLevel(logging.INFO)
+    StageProfiler.logger.propagate = False
+
+# Building the model from the CSV on request is for local development only.
+# The production entry point (wsgi.py) loads the artifact at startup and turns this off.
+app.config.setdefault('ALLOW_TRAINING', True)
+
+# Charts and word clouds are rendered in the background by a bounded pool, so
+# /recommend answers as soon as the recommendations are computed
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 2))
+MAX_PENDING_RENDERS = int(os.environ.get('MAX_PENDING_RENDERS', 32))
+VISUALIZATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'visualizations')
+
+# Optional numeric filters accepted by /recommend (genres are sent as a comma-separated list)
+FILTER_FIELDS = ('min_year', 'max_year', 'min_rating', 'max_rating', 'min_runtime', 'max_runtime')
+
+# Upper bound on the number of seeds accepted by one /recommend/batch request
+MAX_BATCH_SEEDS = int(os.environ.get('MAX_BATCH_SEEDS', 100))
+
+# Rendered images are cached on disk per (movie, top_n, model version) with LRU eviction
+visualization_cache = VisualizationCache(
+    VISUALIZATION_DIR,
+    max_bytes=int(os.environ.get('VISUALIZATION_CACHE_MB', 200)) * 1024 * 1024,
+    max_entries=int(os.environ.get('VISUALIZATION_CACHE_ENTRIES', 1000))
+)
+
+render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='render')
+render_slots = threading.BoundedSemaphore(MAX_PENDING_RENDERS)
+render_state_lock = threading.Lock()
+pending_renders = set()
+failed_renders = {}
+
+def load_model(artifact_path=MODEL_ARTIFACT_PATH):
+    """Load the persisted model, build its lookup structures and mark the app ready."""
+    global model_ready, movie_recommender
+    
+    movie_recommender = MovieRecommendationSystem.load(artifact_path).prepare_for_serving()
+    load_collaborative_model()
+    model_ready = True
+    return movie_recommender
+
+def load_collaborative_model(artifact_path=CF_ARTIFACT_PATH):
+    """Load the collaborative filtering model if its artifact exists (per-user recommendations are optional)."""
+    global cf_model
+    
+    if os.path.exists(os.path.join(artifact_path, 'manifest.json')):
+        cf_model = CollaborativeFilteringModel.load(artifact_path)
+        if HYBRID_WEIGHT > 0 and cf_model.tmdb_ids is not None:
+            movie_recommender.hybrid_engine(cf_model, collaborative_weight=HYBRID_WEIGHT)
+    return cf_model
+
+def prometheus_metrics():
+    """Format the pipeline stage totals, result cache and render queue in the Prometheus text format."""
+    lines = []
+    
+    def metric(name, kind, description, samples):
+        # samples are (name suffix, labels, value) tuples
+        lines.append(f"# HELP movie_recommender_{name} {description}")
+        lines.append(f"# TYPE movie_recommender_{name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ','.join(f'{label}="{text}"' for label, text in labels.items())
+            label_text = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"movie_recommender_{name}{suffix}{label_text} {value}")
+    
+    stages = sorted(movie_recommender.profiler.summary().items())
+    metric('stage_duration_seconds', 'summary', "Wall time of pipeline stages.",
+           [(suffix, {'stage': name}, totals[field]) for name, totals in stages
+            for suffix, field in (('_sum', 'wall_seconds'), ('_count', 'calls'))])
+    metric('stage_cpu_seconds_total', 'counter', "Process CPU time during pipeline stages.",
+           [('', {'stage': name}, totals['cpu_seconds']) for name, totals in stages])
+    metric('stage_errors_total', 'counter', "Pipeline stage runs that raised an error.",
+           [('', {'stage': name}, totals['errors']) for name, totals in stages])
+    metric('stage_max_duration_seconds', 'gauge', "Longest wall time of a pipeline stage run.",
+           [('', {'stage': name}, totals['max_wall_seconds']) for name, totals in stages])
+    metric('stage_last_duration_seconds', 'gauge', "Wall time of the last run of a pipeline stage.",
+           [('', {'stage': name}, totals['last']['wall_seconds']) for name, totals in stages])
+    metric('stage_last_peak_rss_bytes', 'gauge', "Peak process RSS at the end of the last run of a stage.",
+           [('', {'stage': name}, totals['last']['peak_rss_mb'] * 1024 * 1024) for name, totals in stages
+            if totals['last']['peak_rss_mb'] is not None])
+    
+    # Shapes and sizes of the matrices built by the last run of each stage
+    matrices = [(name, matrix, fields) for name, totals in stages
+                for matrix, fields in totals['last'].items() if isinstance(fields, dict) and 'shape' in fields]
+    metric('stage_matrix_rows', 'gauge', "Rows of a matrix built by a pipeline stage.",
+           [('', {'stage': name, 'matrix': matrix}, fields['shape'][0]) for name, matrix, fields in matrices])
+    metric('stage_matrix_columns', 'gauge', "Columns of a matrix built by a pipeline stage.",
+           [('', {'stage': name, 'matrix': matrix}, fields['shape'][-1]) for name, matrix, fields in matrices])
+    metric('stage_matrix_nnz', 'gauge', "Stored values of a sparse matrix built by a pipeline stage.",
+           [('', {'stage': name, 'matrix': matrix}, fields['nnz']) for name, matrix, fields in matrices
+            if 'nnz' in fields])
+    metric('stage_matrix_bytes', 'gauge', "Memory of a matrix built by a pipeline stage.",
+           [('', {'stage': name, 'matrix': matrix}, fields['mb'] * 1024 * 1024) for name, matrix, fields in matrices])
+    
+    if movie_recommender.result_cache is not None:
+        cache = movie_recommender.result_cache.stats()
+        for counter in ('hits', 'misses', 'evictions', 'expirations'):
+            metric(f'result_cache_{counter}_total', 'counter', f"Result cache {counter}.", [('', {}, cache[counter])])
+        metric('result_cache_entries', 'gauge', "Rankings held by the result cache.", [('', {}, cache['entries'])])
+    
+    with render_state_lock:
+        metric('pending_renders', 'gauge', "Visualizations queued or being rendered.", [('', {}, len(pending_renders))])
+    metric('model_ready', 'gauge', "Whether a model is loaded.", [('', {}, int(model_ready))])
+    if model_ready:
+        metric('model_info', 'gauge', "The loaded model.", [('', {
+            'model_version': movie_recommender.model_version,
+            'similarity_mode': movie_recommender.similarity_mode
+        }, 1)])
+        metric('movies', 'gauge', "Movies in the catalog.", [('', {}, len(movie_recommender.movies_df))])
+    
+    return '\n'.join(lines) + '\n'
+
+def render_visualizations(render_id, recommendations, movie_title):
+    """Render the chart and word cloud of one recommendation (runs in render_pool)."""
+    try:
+        renderers = (movie_recommender.visualize_recommendations, movie_recommender.generate_wordcloud)
+        for render, filename in zip(renderers, visualization_cache.filenames(render_id)):
+            visualization_cache.write(
+                filename, lambda path: render(recommendations, movie_title, output_path=path)
+            )
+        visualization_cache.evict()
+    except Exception as e:
+        app.logger.error(f"Error rendering visualizations: {str(e)}")
+        with render_state_lock:
+            failed_renders[render_id] = str(e)
+            # Keep only the most recent failures
+            while len(failed_renders) > MAX_PENDING_RENDERS:
+                failed_renders.pop(next(iter(failed_renders)))
+    finally:
+        with render_state_lock:
+            pending_renders.discard(render_id)
+        render_slots.release()
+
+def schedule_render(render_id, recommendations, movie_title):
+    """
+    Queue the visualizations of a recommendation unless they are cached or queued.
+    
+    Returns 'ready', 'pending' or 'unavailable' (when the render queue is full).
+    """
+    if visualization_cache.get(render_id):
+        return 'ready'
+    
+    with render_state_lock:
+        if render_id in pending_renders:
+            return 'pending'
+        if not render_slots.acquire(blocking=False):
+            return 'unavailable'
+        pending_renders.add(render_id)
+        failed_renders.pop(render_id, None)
+    
+    render_pool.submit(render_visualizations, render_id, recommendations, movie_title)
+    return 'pending'
+
+def parse_filters(form):
+    """Read the optional recommendation filters from a submitted form (None if none are set)."""
+    filters = {name: float(form[name]) for name in FILTER_FIELDS if form.get(name)}
+    if form.get('genres'):
+        filters['genres'] = [genre.strip() for genre in form['genres'].split(',') if genre.strip()]
+    return filters or None
+
+def recommendations_to_list(recommendations):
+    """Convert a recommendations dataframe to a JSON-serializable list of dictionaries."""
+    recommendations_list = []
+    for _, row in recommendations.iterrows():
+        recommendations_list.append({
+            'title': row['title'],
+            'genre_names': row['genre_names'],
+            'vote_average': float(row['vote_average']),
+            'release_date': row['release_date'],
+            'similarity_score': float(row['similarity_score']),
+            'overview': row['overview']
+        })
+    return recommendations_list
+
 @app.route('/')
 def home():
     return render_template('index.html', model_ready=model_ready)
 
 @app.route('/initialize', methods=['GET'])
 def initialize_model():
-    global model_ready
+    global model_ready, movie_recommender
     
     if not model_ready:
         try:
             # Initialize the model in the background
             app.logger.info("Initializing recommendation system...")
             
-            # Load data and prepare the model
-            movie_recommender.data_ingestion('movies_metadata.csv')
-            movie_recommender.preprocessing_pipeline()
-            movie_recommender.similarity_engine()
+            if os.path.exists(os.path.join(MODEL_ARTIFACT_PATH, 'manifest.json')):
+                # Memory-map the persisted model instead of rebuilding it
+                load_model()
+            elif not app.config['ALLOW_TRAINING']:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'No model artifact found at {MODEL_ARTIFACT_PATH}; training is disabled on this server'
+                }), 503
+            else:
+                # Load data and prepare the model, then persist it for the next start
+                movie_recommender.data_ingestion('movies_metadata.csv')
+                movie_recommender.preprocessing_pipeline()
+                movie_recommender.similarity_engine(similarity_mode='on_demand')
+                movie_recommender.save(MODEL_ARTIFACT_PATH)
+                movie_recommender.prepare_for_serving()
+                load_collaborative_model()
+                model_ready = True
             
-            model_ready = True
             app.logger.info("Recommendation system initialized!")
             
             return jsonify({'status': 'success', 'message': 'Model initialized successfully'})
@@ -55,7 +261,10 @@ def recommend():
         # Get recommendations
         if choice_index is not None:
             choice_index = int(choice_index)
-        result = movie_recommender.recommendation_service(movie_title, choice_index=choice_index, exact_match=True)
+        filters = parse_filters(request.form)
+        result = movie_recommender.recommendation_service(
+            movie_title, choice_index=choice_index, exact_match=True, filters=filters
+        )
         
         # Check if we got multiple matches
         if isinstance(result, dict):
@@ -74,60 +283,218 @@ def recommend():
         input_idx, recommendations = result
         
         if recommendations.empty:
-            return jsonify({'status': 'error', 'message': 'No recommendations found'})
+            message = 'No movies match the filters' if filters else 'No recommendations found'
+            return jsonify({'status': 'error', 'message': message})
             
         # Convert recommendations to a list of dictionaries
-        recommendations_list = []
-        for _, row in recommendations.iterrows():
-            recommendations_list.append({
-                'title': row['title'],
-                'genre_names': row['genre_names'],
-                'vote_average': float(row['vote_average']),
-                'release_date': row['release_date'],
-                'similarity_score': float(row['similarity_score']),
-                'overview': row['overview']
-            })
+        recommendations_list = recommendations_to_list(recommendations)
         
-        # Create directory for visualizations if it doesn't exist
-        os.makedirs('static/visualizations', exist_ok=True)
+        # Visualizations depend only on the input movie, the number of recommendations, the filters and the model
+        render_id = VisualizationCache.key(
+            int(input_idx), len(recommendations), movie_recommender.model_version, filters
+        )
+        render_status = schedule_render(render_id, recommendations, movie_title)
         
-        # Format the movie title for filenames
-        formatted_title = movie_title.lower().replace(' ', '_').replace(':', '').replace('/', '_')
-        
-        # Set up paths for saving visualizations directly to static folder
-        static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
-        chart_save_path = os.path.join(static_folder, f"visualizations/{formatted_title}_similarity_chart.png")
-        wordcloud_save_path = os.path.join(static_folder, f"visualizations/{formatted_title}_wordcloud.png")
-        
-        # For web display, use these paths
-        chart_path = f"/static/visualizations/{formatted_title}_similarity_chart.png"
-        wordcloud_path = f"/static/visualizations/{formatted_title}_wordcloud.png"
-        
-        # Generate visualizations directly to the static folder
-        movie_recommender.visualize_recommendations(recommendations, movie_title, output_path=chart_save_path)
-        movie_recommender.generate_wordcloud(recommendations, movie_title, output_path=wordcloud_save_path)
+        # For web display, use these paths once the render status is 'ready'
+        chart_file, wordcloud_file = visualization_cache.filenames(render_id)
+        chart_path = f"/static/visualizations/{chart_file}"
+        wordcloud_path = f"/static/visualizations/{wordcloud_file}"
         
         # Get evaluation metrics
         eval_metrics = movie_recommender.evaluation_framework(recommendations, input_idx)
         
-        import matplotlib.pyplot as plt
-        plt.close('all')  # Close all open figures to free up memory
-
         return jsonify({
             'status': 'success',
             'recommendations': recommendations_list,
             'chart_path': chart_path,
             'wordcloud_path': wordcloud_path,
+            'render_status': render_status,
+            'render_status_url': f"/render_status/{render_id}",
             'metrics': eval_metrics
         })
     
     except Exception as e:
-        import matplotlib.pyplot as plt
-        plt.close('all')  # Make sure to close all plot windows
         app.logger.error(f"Error generating recommendations: {str(e)}")
         return jsonify({'status': 'error', 'message': f'Error: {str(e)}'})
 
 
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    if not model_ready:
+        return jsonify({'status': 'error', 'message': 'Model not initialized yet'})
+    
+    # JSON body: {"seeds": [movie ids or exact titles], "top_n": 10, "visualize": false, "include_metrics": false}
+    payload = request.get_json(silent=True) or {}
+    seeds = payload.get('seeds')
+    if not isinstance(seeds, list) or not seeds:
+        return jsonify({'status': 'error', 'message': 'Request body must contain a non-empty "seeds" list'}), 400
+    if len(seeds) > MAX_BATCH_SEEDS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BATCH_SEEDS} seeds are allowed per request'}), 400
+    if not all(isinstance(seed, (int, str)) and not isinstance(seed, bool) for seed in seeds):
+        return jsonify({'status': 'error', 'message': 'Seeds must be movie ids or titles'}), 400
+    
+    try:
+        top_n = int(payload.get('top_n', 10))
+        if not 1 <= top_n <= 100:
+            return jsonify({'status': 'error', 'message': 'top_n must be between 1 and 100'}), 400
+        
+        # Score all seeds together (one matrix product per block of seeds)
+        results = []
+        for entry in movie_recommender.recommend_many(seeds, top_n=top_n):
+            if 'error' in entry:
+                results.append({'seed': entry['seed'], 'status': 'no_match'})
+                continue
+            
+            recommendations = entry['recommendations']
+            result = {
+                'seed': entry['seed'],
+                'status': 'success',
+                'movie_id': entry['movie_id'],
+                'title': entry['title'],
+                'recommendations': recommendations_to_list(recommendations)
+            }
+            
+            if payload.get('visualize'):
+                render_id = VisualizationCache.key(entry['movie_id'], len(recommendations), movie_recommender.model_version)
+                chart_file, wordcloud_file = visualization_cache.filenames(render_id)
+                result.update({
+                    'chart_path': f"/static/visualizations/{chart_file}",
+                    'wordcloud_path': f"/static/visualizations/{wordcloud_file}",
+                    'render_status': schedule_render(render_id, recommendations, entry['title']),
+                    'render_status_url': f"/render_status/{render_id}"
+                })
+            
+            if payload.get('include_metrics'):
+                result['metrics'] = movie_recommender.evaluation_framework(recommendations, entry['movie_id'])
+            
+            results.append(result)
+        
+        return jsonify({'status': 'success', 'results': results})
+    
+    except Exception as e:
+        app.logger.error(f"Error generating batch recommendations: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error: {str(e)}'})
+
+
+@app.route('/recommend/seeds', methods=['POST'])
+def recommend_from_seeds():
+    if not model_ready:
+        return jsonify({'status': 'error', 'message': 'Model not initialized yet'})
+    
+    # JSON body: {"movie_ids": [liked movie ids], "weights": [optional], "top_n": 10, "method": "centroid",
+    #             "filters": {"genres": ["Drama"], "min_year": 2000, "min_rating": 7}}
+    payload = request.get_json(silent=True) or {}
+    movie_ids = payload.get('movie_ids')
+    weights = payload.get('weights')
+    if not isinstance(movie_ids, list) or not movie_ids:
+        return jsonify({'status': 'error', 'message': 'Request body must contain a non-empty "movie_ids" list'}), 400
+    if len(movie_ids) > MAX_BATCH_SEEDS:
+        return jsonify({'status': 'error', 'message': f'At most {MAX_BATCH_SEEDS} seeds are allowed per request'}), 400
+    if not all(isinstance(movie_id, int) and not isinstance(movie_id, bool) for movie_id in movie_ids):
+        return jsonify({'status': 'error', 'message': 'movie_ids must be integers'}), 400
+    if weights is not None and not (isinstance(weights, list) and all(
+            isinstance(weight, (int, float)) and not isinstance(weight, bool) for weight in weights)):
+        return jsonify({'status': 'error', 'message': 'weights must be a list of numbers'}), 400
+    filters = payload.get('filters')
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({'status': 'error', 'message': 'filters must be an object'}), 400
+    
+    try:
+        top_n = int(payload.get('top_n', 10))
+        if not 1 <= top_n <= 100:
+            return jsonify({'status': 'error', 'message': 'top_n must be between 1 and 100'}), 400
+        
+        # One fused scoring pass over the catalog for all seeds
+        recommendations = movie_recommender.recommend_from_seeds(
+            movie_ids, weights=weights, top_n=top_n, method=payload.get('method', 'centroid'), filters=filters
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error generating seed recommendations: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error: {str(e)}'})
+    
+    return jsonify({'status': 'success', 'recommendations': recommendations_to_list(recommendations)})
+
+
+@app.route('/recommend/user/<int:user_id>', methods=['GET'])
+def recommend_for_user(user_id):
+    if cf_model is None:
+        return jsonify({'status': 'error', 'message': 'No collaborative filtering model is loaded'}), 503
+    
+    top_n = request.args.get('top_n', 10, type=int)
+    if not 1 <= top_n <= 100:
+        return jsonify({'status': 'error', 'message': 'top_n must be between 1 and 100'}), 400
+    
+    try:
+        recommendations = cf_model.recommend(user_id, top_n=top_n)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    
+    # Top-N movies for the user from the ratings-based model, as MovieLens (and TMDB) ids
+    recommendations_list = []
+    for _, row in recommendations.iterrows():
+        movie = {'movieId': int(row['movieId']), 'score': float(row['score'])}
+        if 'tmdbId' in recommendations.columns:
+            movie['tmdbId'] = int(row['tmdbId'])
+        recommendations_list.append(movie)
+    
+    return jsonify({'status': 'success', 'user_id': user_id, 'recommendations': recommendations_list})
+
+
+@app.route('/render_status/<render_id>', methods=['GET'])
+def get_render_status(render_id):
+    # Render ids are generated by /recommend; reject anything else before touching the disk
+    if not re.fullmatch(r'[0-9a-f]{24}', render_id):
+        return jsonify({'status': 'error', 'message': 'Unknown render id'}), 404
+    
+    # The cache directory is shared by all workers, so it is the source of truth
+    if visualization_cache.get(render_id):
+        return jsonify({'status': 'ready'})
+    
+    with render_state_lock:
+        error = failed_renders.get(render_id)
+    if error is not None:
+        return jsonify({'status': 'error', 'message': error})
+    return jsonify({'status': 'pending'})
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Readiness probe: 503 until a model is loaded, so load balancers hold traffic
+    if not model_ready:
+        return jsonify({'status': 'unavailable', 'model_ready': False}), 503
+    
+    return jsonify({
+        'status': 'ok',
+        'model_ready': True,
+        'n_movies': len(movie_recommender.movies_df),
+        'similarity_mode': movie_recommender.similarity_mode,
+        'collaborative_weight': movie_recommender.collaborative_weight,
+        'model_version': movie_recommender.model_version,
+        'result_cache': movie_recommender.result_cache.stats() if movie_recommender.result_cache else None,
+        'pid': os.getpid()
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape target; each gunicorn worker reports its own process
+    return prometheus_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+@app.route('/search', methods=['GET'])
+def search():
+    if not model_ready:
+        return jsonify({'status': 'error', 'message': 'Model not initialized yet'})
+    
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    
+    # Ranked prefix and typo-tolerant title matches for autocomplete
+    results = movie_recommender.search_titles(query, limit=limit) if query else []
+    return jsonify({'status': 'success', 'results': results})
+
 
 if __name__ == '__main__':
     # Create visualizations directory if it doesn't exist
@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+import gc
+import multiprocessing
+import os
+
+# Each request thread runs its own matrix products, so keep BLAS single-threaded
+# to avoid oversubscribing the cores (must be set before numpy is imported)
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 80)}"
+
+# Load the model once in the master process; forked workers share it copy-on-write
+preload_app = True
+
+# Threads within a worker serve concurrent requests from the same read-only model
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+
+
+def when_ready(server):
+    # Move the preloaded model out of the garbage collector's reach, so that
+    # collections in the workers do not write to (and copy) its pages
+    gc.collect()
+    gc.freeze()
@@ -67,6 +67,51 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Add the filter fields that are filled in to a recommendation request
+    function appendFilters(formData) {
+        ['genres', 'min_year', 'min_rating', 'max_runtime'].forEach(name => {
+            const field = recommendForm.elements[name];
+            if (field && field.value.trim() !== '') {
+                formData.append(name, field.value.trim());
+            }
+        });
+    }
+
+    // Title autocomplete backed by the /search endpoint
+    const movieTitleInput = document.getElementById('movieTitle');
+    const titleSuggestions = document.getElementById('titleSuggestions');
+    let searchTimeout = null;
+    
+    if (movieTitleInput && titleSuggestions) {
+        movieTitleInput.addEventListener('input', function() {
+            clearTimeout(searchTimeout);
+            const query = movieTitleInput.value.trim();
+            
+            if (query.length < 2) {
+                titleSuggestions.innerHTML = '';
+                return;
+            }
+            
+            // Wait for a pause in typing before querying the server
+            searchTimeout = setTimeout(function() {
+                fetch('/search?q=' + encodeURIComponent(query) + '&limit=8')
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.status !== 'success') {
+                            return;
+                        }
+                        const titles = [...new Set(data.results.map(movie => movie.title))];
+                        titleSuggestions.innerHTML = titles.map(title => {
+                            const option = document.createElement('option');
+                            option.value = title;
+                            return option.outerHTML;
+                        }).join('');
+                    })
+                    .catch(error => console.error('Error:', error));
+            }, 150);
+        });
+    }
+
     // Recommendation form submit handler
     if (recommendForm) {
         recommendForm.addEventListener('submit', function(e) {
@@ -84,6 +129,7 @@ document.addEventListener('DOMContentLoaded', function() {
             // Create form data
             const formData = new FormData();
             formData.append('movie_title', movieTitle);
+            appendFilters(formData);
             
             // Send request to the server
             fetch('/recommend', {
@@ -168,6 +214,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 const formData = new FormData();
                 formData.append('movie_title', movieTitle);
                 formData.append('choice_index', choiceIndex);
+                appendFilters(formData);
                 
                 // Send request with the chosen movie
                 fetch('/recommend', {
@@ -333,8 +380,8 @@ document.addEventListener('DOMContentLoaded', function() {
                                 <h3 class="card-title mb-0">Similarity Chart</h3>
                             </div>
                         </div>
-                        <div class="card-body text-center">
-                            <img src="${data.chart_path}?t=${new Date().getTime()}" class="img-fluid rounded" alt="Similarity chart">
+                        <div class="card-body text-center" id="chartContainer">
+                            ${visualizationPlaceholder()}
                         </div>
                     </div>
                 </div>
@@ -346,8 +393,8 @@ document.addEventListener('DOMContentLoaded', function() {
                                 <h3 class="card-title mb-0">Themes & Topics</h3>
                             </div>
                         </div>
-                        <div class="card-body text-center">
-                            <img src="${data.wordcloud_path}?t=${new Date().getTime()}" class="img-fluid rounded" alt="Word cloud">
+                        <div class="card-body text-center" id="wordcloudContainer">
+                            ${visualizationPlaceholder()}
                         </div>
                     </div>
                 </div>
@@ -400,6 +447,70 @@ document.addEventListener('DOMContentLoaded', function() {
         // Update the recommendations container with the generated HTML
         recommendationsContainer.innerHTML = recommendationsHTML;
         recommendationsContainer.style.display = 'block';
+        
+        // The chart and word cloud are rendered in the background; show them once ready
+        renderGeneration += 1;
+        pollVisualizations(data, renderGeneration);
+    }
+
+    // Spinner shown while a visualization is being rendered
+    function visualizationPlaceholder() {
+        return `
+            <div class="py-5 text-muted">
+                <div class="spinner-border text-primary mb-3" role="status"></div>
+                <p class="mb-0">Rendering...</p>
+            </div>
+        `;
+    }
+
+    // Poll the render status URL and swap the placeholders for the images when they are ready
+    // Only the most recently displayed recommendations keep polling
+    let renderGeneration = 0;
+    
+    function pollVisualizations(data, generation, attempt = 0) {
+        if (generation !== renderGeneration) {
+            return;
+        }
+        const chartContainer = document.getElementById('chartContainer');
+        const wordcloudContainer = document.getElementById('wordcloudContainer');
+        
+        const showImages = function() {
+            chartContainer.innerHTML = `<img src="${data.chart_path}" class="img-fluid rounded" alt="Similarity chart">`;
+            wordcloudContainer.innerHTML = `<img src="${data.wordcloud_path}" class="img-fluid rounded" alt="Word cloud">`;
+        };
+        const showUnavailable = function(message) {
+            const html = `<p class="text-muted py-5 mb-0">${message}</p>`;
+            chartContainer.innerHTML = html;
+            wordcloudContainer.innerHTML = html;
+        };
+        
+        if (data.render_status === 'ready') {
+            showImages();
+            return;
+        }
+        if (data.render_status === 'unavailable' || attempt >= 120) {
+            showUnavailable('Visualization is not available right now.');
+            return;
+        }
+        
+        setTimeout(function() {
+            fetch(data.render_status_url)
+                .then(response => response.json())
+                .then(status => {
+                    if (generation !== renderGeneration) {
+                        return;
+                    }
+                    if (status.status === 'error') {
+                        showUnavailable('Visualization could not be generated.');
+                        return;
+                    }
+                    pollVisualizations(Object.assign({}, data, {render_status: status.status}), generation, attempt + 1);
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    pollVisualizations(data, generation, attempt + 1);
+                });
+        }, 500);
     }
 
     // Add event listener for the back to search button
@@ -0,0 +1,136 @@
+# visualization_cache.py
+import hashlib
+import os
+import threading
+import time
+
+
+class VisualizationCache:
+    """
+    A size-bounded disk cache for rendered recommendation images.
+
+    Entries are content-addressed: the key is a hash of the input movie id, the
+    number of recommendations, the filters and the model version, so an image
+    is never shared between different results and a new model never serves
+    stale images. Files are written to a temporary name and renamed into
+    place, so a file that exists is always complete and every process sharing
+    the directory can treat its presence as a cache hit. Hits refresh the file
+    modification time, and the least recently used entries are evicted once
+    the cache holds more than max_bytes or max_entries.
+
+    Parameters:
+    -----------
+    directory : str
+        Directory holding the cached files (created if missing)
+    max_bytes : int, default=200 MB
+        Total size the cached files may use
+    max_entries : int, default=1000
+        Number of cached entries (recommendations) to keep
+    """
+
+    SUFFIXES = ('_similarity_chart.png', '_wordcloud.png')
+
+    # Temporary files older than this are leftovers of interrupted renders
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, max_entries=1000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._evict_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(movie_id, top_n, model_version, filters=None):
+        """Return the cache key of a recommendation."""
+        text = f"{movie_id}:{top_n}:{model_version}"
+        if filters:
+            text += f":{sorted(filters.items())}"
+        return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+    def filenames(self, key):
+        """Return the file names of the chart and word cloud of an entry."""
+        return tuple(f"{key}{suffix}" for suffix in self.SUFFIXES)
+
+    def get(self, key):
+        """
+        Look up an entry and mark it as recently used.
+
+        Returns:
+        --------
+        bool
+            True if every file of the entry exists
+        """
+        paths = [os.path.join(self.directory, filename) for filename in self.filenames(key)]
+        try:
+            for path in paths:
+                os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def write(self, filename, render):
+        """
+        Atomically write one file of an entry.
+
+        Parameters:
+        -----------
+        filename : str
+            Name of the file inside the cache directory
+        render : callable
+            Called with a temporary .png path to write the image to
+        """
+        final_path = os.path.join(self.directory, filename)
+        temp_path = f"{final_path[:-len('.png')]}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        try:
+            render(temp_path)
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is within its bounds.
+
+        Returns:
+        --------
+        int
+            The number of entries removed
+        """
+        with self._evict_lock:
+            entries = {}
+            now = time.time()
+            with os.scandir(self.directory) as scan:
+                for item in scan:
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    if item.name.endswith('.tmp.png'):
+                        if now - stat.st_mtime > self.STALE_TEMP_SECONDS:
+                            self._remove(item.path)
+                        continue
+                    key = item.name.split('_', 1)[0]
+                    last_used, size, paths = entries.get(key, (0, 0, []))
+                    entries[key] = (max(last_used, stat.st_mtime), size + stat.st_size, paths + [item.path])
+
+            total_bytes = sum(size for _, size, _ in entries.values())
+            removed = 0
+            for key, (_, size, paths) in sorted(entries.items(), key=lambda entry: entry[1][0]):
+                if total_bytes <= self.max_bytes and len(entries) - removed <= self.max_entries:
+                    break
+                for path in paths:
+                    self._remove(path)
+                total_bytes -= size
+                removed += 1
+
+            return removed
+
+    @staticmethod
+    def _remove(path):
+        # Another process may have evicted the same file first
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,17 @@
+# wsgi.py
+"""
+Production entry point for the movie recommender web app.
+
+Serve it with gunicorn, which picks up gunicorn.conf.py from this directory:
+
+    MODEL_ARTIFACT_PATH=model_artifact gunicorn
+
+The persisted model is loaded here once, in the gunicorn master (preload_app),
+before the workers are forked. Its memory-mapped arrays and lookup structures
+are then shared copy-on-write by every worker, and the server never trains a
+model in response to a request: startup fails if the artifact is missing.
+"""
+from app import app, load_model
+
+app.config['ALLOW_TRAINING'] = False
+load_model()
@@ -8,199 +8,2802 @@ Description: module for Movie Recommendation System
 import pandas as pd
 import numpy as np
 import ast
-from sklearn.preprocessing import MultiLabelBinarizer, StandardScaler
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import time
+import tracemalloc
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from sklearn.preprocessing import MultiLabelBinarizer, StandardScaler, normalize
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
-from scipy.sparse import csr_matrix, hstack
+from sklearn.decomposition import TruncatedSVD, IncrementalPCA
+from scipy.sparse import csr_matrix, hstack, vstack, save_npz, load_npz
+from pandas.api.types import union_categoricals
+import joblib
+from joblib import Parallel, delayed
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import seaborn as sns
 sns.set()
 
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _describe_matrix(matrix):
+    """Return the shape, memory and (for sparse matrices) stored values of a matrix for stage records."""
+    if hasattr(matrix, 'nnz'):
+        nbytes = matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return {'shape': list(matrix.shape), 'nnz': int(matrix.nnz), 'mb': nbytes / (1024 * 1024)}
+    return {'shape': list(matrix.shape), 'mb': matrix.nbytes / (1024 * 1024)}
+
+
+def _profiled(name):
+    """Record every call of a MovieRecommendationSystem method as a profiler stage."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Layout of the nested JSON-like fields in movies_metadata.csv, used by the fast parsers
+_GENRE_PATTERN = re.compile(r"\{'id': (\d+), 'name': '([^'\\]*)'\}")
+_COLLECTION_PATTERN = re.compile(
+    r"\{'id': \d+, 'name': (?:'([^'\\]*)'|\"([^\"\\]*)\"), "
+    r"'poster_path': (?:'[^'\\]*'|None), 'backdrop_path': (?:'[^'\\]*'|None)\}"
+)
+
+
+def _parse_genres(value):
+    """
+    Parse a genres field into a list of {'id': ..., 'name': ...} dicts.
+    
+    Uses a compiled regex for the layout of the Kaggle export and falls back to
+    ast.literal_eval whenever the matches do not reproduce the whole string, so
+    the result is always identical to literal_eval's. Non-strings parse to [].
+    """
+    if not isinstance(value, str):
+        return []
+    genres = [{'id': int(genre_id), 'name': name} for genre_id, name in _GENRE_PATTERN.findall(value)]
+    rebuilt = '[' + ', '.join(f"{{'id': {genre['id']}, 'name': '{genre['name']}'}}" for genre in genres) + ']'
+    if rebuilt == value:
+        return genres
+    return ast.literal_eval(value)
+
+
+def _parse_collection_name(value):
+    """
+    Extract the collection name from a belongs_to_collection field.
+    
+    Well-formed fields are matched with a compiled regex; anything else goes
+    through ast.literal_eval. Missing or unparsable fields return "".
+    """
+    if pd.isna(value) or value == "" or value == "NaN":
+        return ""
+    match = _COLLECTION_PATTERN.fullmatch(value)
+    if match:
+        return match.group(1) if match.group(1) is not None else match.group(2)
+    try:
+        data = ast.literal_eval(value)
+        return data.get("name", "")
+    except Exception:
+        return ""
+
+
+def _parse_values(values, parser):
+    """Apply parser to each value; a top-level function so joblib workers can run it."""
+    return [parser(value) for value in values]
+
+
+def _parse_column(values, parser, n_jobs=1, min_parallel_values=5000):
+    """
+    Parse a column so that each distinct value is parsed only once.
+    
+    Parameters:
+    -----------
+    values : pandas.Series
+        Raw column (object or category dtype)
+    parser : callable
+        Top-level function applied to each distinct value
+    n_jobs : int, default=1
+        Number of worker processes used when there are at least
+        min_parallel_values distinct values
+    min_parallel_values : int, default=5000
+        Below this many distinct values, parsing stays in-process
+        
+    Returns:
+    --------
+    list
+        The parsed value of every row. Mutable results are copied per row.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = list(uniques)
+    
+    if n_jobs != 1 and len(uniques) >= min_parallel_values:
+        n_chunks = os.cpu_count() if n_jobs == -1 else n_jobs
+        chunk_size = -(-len(uniques) // n_chunks)
+        parsed = [
+            value
+            for chunk in Parallel(n_jobs=n_jobs)(
+                delayed(_parse_values)(uniques[start:start + chunk_size], parser)
+                for start in range(0, len(uniques), chunk_size)
+            )
+            for value in chunk
+        ]
+    else:
+        parsed = _parse_values(uniques, parser)
+    
+    # Missing values have code -1
+    parsed.append(parser(np.nan))
+    if isinstance(parsed[-1], list):
+        return [list(parsed[code]) for code in codes]
+    return [parsed[code] for code in codes]
+
+
+def _one_hot(codes, n_columns, weight=1):
+    """
+    Build a sparse one-hot matrix from integer category codes.
+    
+    Parameters:
+    -----------
+    codes : numpy.ndarray
+        Column index of every row, or -1 for rows without a category
+    n_columns : int
+        Number of categories
+    weight : int, default=1
+        Value stored for every non-zero entry
+        
+    Returns:
+    --------
+    scipy.sparse.csr_matrix
+        A matrix of shape (len(codes), n_columns)
+    """
+    codes = np.asarray(codes)
+    rows = np.flatnonzero(codes >= 0)
+    return csr_matrix((np.full(len(rows), weight), (rows, codes[rows])), shape=(len(codes), n_columns))
+
+
+def _block_top_k(features, rows, k, removed_mask=None):
+    """
+    Compute the k nearest neighbors of a block of rows.
+    
+    Runs inside a joblib worker, so only a len(rows) x N block of scores is
+    ever materialized. Rows are ranked exactly like MovieRecommendationSystem._top_k
+    and the first-ranked entry (the movie itself) is dropped.
+    
+    Parameters:
+    -----------
+    features : numpy.ndarray
+        L2-normalized feature matrix (memory-mapped by joblib for large inputs)
+    rows : numpy.ndarray
+        Positions of the query rows in the block
+    k : int
+        Number of neighbors to keep per row
+    removed_mask : numpy.ndarray, optional
+        Boolean mask of removed movies, which are never returned as neighbors
+        
+    Returns:
+    --------
+    tuple
+        (neighbor_indices, neighbor_scores) as int32 and float32 arrays of shape (len(rows), k)
+    """
+    scores = features[rows] @ features.T
+    if removed_mask is not None:
+        scores[:, removed_mask] = -np.inf
+    n_rows, n_cols = scores.shape
+    width = min(k + 1, n_cols)
+    rows = np.arange(n_rows)[:, None]
+    
+    candidates = np.argpartition(-scores, width - 1, axis=1)[:, :width]
+    candidate_scores = scores[rows, candidates]
+    
+    # Order each row by descending score, breaking ties by ascending position
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    candidates = candidates[rows, order]
+    candidate_scores = candidate_scores[rows, order]
+    
+    # Rows with ties at the cut-off may have kept the wrong tied entries; rank those exactly
+    tied = np.flatnonzero((scores >= candidate_scores[:, -1:]).sum(axis=1) > width)
+    for row in tied:
+        candidates[row] = MovieRecommendationSystem._top_k(scores[row], width)
+        candidate_scores[row] = scores[row, candidates[row]]
+    
+    return candidates[:, 1:k + 1].astype(np.int32), candidate_scores[:, 1:k + 1].astype(np.float32)
+
+
+class IVFIndex:
+    """
+    An inverted-file (IVF) approximate nearest-neighbor index over L2-normalized vectors.
+    
+    The vectors are partitioned with spherical k-means and stored contiguously
+    list by list. A query is scored against the centroids first and then only
+    against the vectors of the n_probe closest lists, so the cost of a query
+    grows with n_probe * N / n_lists instead of N. Any object exposing the same
+    build() and search() methods can be plugged into
+    MovieRecommendationSystem.ann_index() instead.
+    
+    Parameters:
+    -----------
+    n_lists : int, optional
+        Number of partitions. Defaults to 4 * sqrt(N).
+    n_probe : int, default=8
+        Number of partitions scanned per query
+    n_iter : int, default=10
+        Number of k-means iterations
+    random_state : int, default=42
+        Seed for centroid initialization and training sample selection
+    """
+    
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+        self.list_vectors = None
+        self.pending = {}
+        self.removed_ids = np.empty(0, dtype=np.int32)
+    
+    def _assign(self, features, centroids, block_size=4096):
+        """Return the closest centroid of every row, computed in row blocks."""
+        assignments = np.empty(features.shape[0], dtype=np.int32)
+        for start in range(0, features.shape[0], block_size):
+            block = features[start:start + block_size] @ centroids.T
+            assignments[start:start + block_size] = block.argmax(axis=1)
+        return assignments
+    
+    def build(self, features):
+        """
+        Partition the vectors and build the inverted lists.
+        
+        Parameters:
+        -----------
+        features : numpy.ndarray
+            L2-normalized feature matrix of shape (N, d)
+            
+        Returns:
+        --------
+        IVFIndex
+            The fitted index
+        """
+        rng = np.random.default_rng(self.random_state)
+        features = np.asarray(features, dtype=np.float32)
+        n_movies = features.shape[0]
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n_movies)))
+        n_lists = min(n_lists, n_movies)
+        
+        # Train the centroids on a sample of up to 256 vectors per list
+        sample_size = min(n_movies, 256 * n_lists)
+        sample = features[np.sort(rng.choice(n_movies, sample_size, replace=False))]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            
+            # Re-seed empty partitions with random sample vectors
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            sums[empty] = sample[rng.choice(sample_size, empty.sum())]
+            centroids = normalize(sums).astype(np.float32)
+        
+        # Store the vectors of each list contiguously for cache-friendly scans
+        assignments = self._assign(features, centroids)
+        self.list_ids = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.list_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(assignments, minlength=n_lists)))
+        ).astype(np.int64)
+        self.list_vectors = features[self.list_ids]
+        self.centroids = centroids
+        self.n_lists = n_lists
+        return self
+    
+    def search(self, query, k, n_probe=None):
+        """
+        Find the approximate k nearest neighbors of a query vector.
+        
+        Parameters:
+        -----------
+        query : numpy.ndarray
+            L2-normalized query vector of shape (d,)
+        k : int
+            Number of neighbors to return
+        n_probe : int, optional
+            Number of partitions to scan. Defaults to self.n_probe.
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (positions, scores) ordered by descending score
+        """
+        query = np.asarray(query, dtype=np.float32)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = MovieRecommendationSystem._top_k(self.centroids @ query, n_probe)
+        
+        candidate_ids = [self.list_ids[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes]
+        candidate_scores = [self.list_vectors[self.list_offsets[p]:self.list_offsets[p + 1]] @ query for p in probes]
+        for p in probes:
+            if p in self.pending:
+                candidate_ids.append(self.pending[p][0])
+                candidate_scores.append(self.pending[p][1] @ query)
+        candidate_ids = np.concatenate(candidate_ids)
+        candidate_scores = np.concatenate(candidate_scores)
+        
+        if len(self.removed_ids):
+            keep = ~np.isin(candidate_ids, self.removed_ids)
+            candidate_ids, candidate_scores = candidate_ids[keep], candidate_scores[keep]
+        
+        # Rank by score, breaking ties by catalog position like the exact engine
+        order = np.argsort(candidate_ids, kind='stable')
+        candidate_ids, candidate_scores = candidate_ids[order], candidate_scores[order]
+        top = MovieRecommendationSystem._top_k(candidate_scores, k)
+        return candidate_ids[top], candidate_scores[top]
+    
+    def add(self, ids, vectors):
+        """
+        Insert new vectors without retraining the partitions.
+        
+        Each vector is assigned to its closest centroid and kept in a small
+        per-list buffer that is scanned together with the list, so the cost
+        depends only on the number of inserted vectors. compact() merges the
+        buffers into the contiguous layout.
+        
+        Parameters:
+        -----------
+        ids : numpy.ndarray
+            Catalog positions of the new vectors
+        vectors : numpy.ndarray
+            L2-normalized vectors of shape (len(ids), d)
+        """
+        ids = np.asarray(ids, dtype=np.int32)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        assignments = self._assign(vectors, self.centroids)
+        for list_id in np.unique(assignments):
+            members = assignments == list_id
+            pending_ids, pending_vectors = self.pending.get(
+                list_id, (np.empty(0, dtype=np.int32), np.empty((0, vectors.shape[1]), dtype=np.float32))
+            )
+            self.pending[list_id] = (np.concatenate([pending_ids, ids[members]]),
+                                     np.concatenate([pending_vectors, vectors[members]]))
+    
+    def remove(self, ids):
+        """Exclude the given catalog positions from all future search results."""
+        self.removed_ids = np.union1d(self.removed_ids, np.asarray(ids, dtype=np.int32))
+    
+    def compact(self):
+        """Merge pending insertions into the contiguous lists and drop removed vectors."""
+        if not self.pending and not len(self.removed_ids):
+            return self
+        
+        ids, vectors, assignments = [], [], []
+        for list_id in range(self.n_lists):
+            start, stop = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            list_ids, list_vectors = self.list_ids[start:stop], self.list_vectors[start:stop]
+            if list_id in self.pending:
+                list_ids = np.concatenate([list_ids, self.pending[list_id][0]])
+                list_vectors = np.concatenate([list_vectors, self.pending[list_id][1]])
+            keep = ~np.isin(list_ids, self.removed_ids)
+            ids.append(list_ids[keep])
+            vectors.append(list_vectors[keep])
+            assignments.append(np.full(keep.sum(), list_id))
+        
+        self.list_ids = np.concatenate(ids).astype(np.int32)
+        self.list_vectors = np.concatenate(vectors)
+        self.list_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(np.concatenate(assignments), minlength=self.n_lists)))
+        ).astype(np.int64)
+        self.pending = {}
+        self.removed_ids = np.empty(0, dtype=np.int32)
+        return self
+    
+    def to_arrays(self):
+        """Return the arrays that define the fitted index, for persistence."""
+        self.compact()
+        return {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_ids': self.list_ids,
+            'list_vectors': self.list_vectors
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays, n_probe=8):
+        """Rebuild a fitted index from the arrays returned by to_arrays()."""
+        index = cls(n_lists=len(arrays['centroids']), n_probe=n_probe)
+        for name, array in arrays.items():
+            setattr(index, name, array)
+        return index
+
+
+class EmbeddingStore:
+    """
+    L2-normalized movie embeddings kept in reduced precision.
+    
+    Vectors are stored as float32, float16 or int8 codes with one float32 scale
+    per row (the row's largest magnitude divided by 127). Queries are scored
+    directly on the stored form in row blocks, so only block_size rows are ever
+    expanded to float32 at once.
+    
+    Parameters:
+    -----------
+    precision : {'float32', 'float16', 'int8'}, default='int8'
+        Storage precision of the embeddings
+    block_size : int, default=8192
+        Number of rows decoded per block while scoring
+    """
+    
+    PRECISIONS = ('float32', 'float16', 'int8')
+    
+    def __init__(self, precision='int8', block_size=8192):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: '{precision}'")
+        self.precision = precision
+        self.block_size = block_size
+        self.codes = None
+        self.scales = None
+    
+    def build(self, features):
+        """
+        Encode the given L2-normalized vectors.
+        
+        Parameters:
+        -----------
+        features : numpy.ndarray
+            Vectors of shape (N, d)
+            
+        Returns:
+        --------
+        EmbeddingStore
+            The fitted store (self)
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if self.precision == 'int8':
+            self.scales = np.abs(features).max(axis=1) / 127
+            self.scales[self.scales == 0] = 1
+            self.codes = np.rint(features / self.scales[:, None]).astype(np.int8)
+        else:
+            self.codes = features.astype(self.precision)
+        return self
+    
+    def append(self, features):
+        """Encode more vectors and append them after the existing rows."""
+        new_rows = EmbeddingStore(self.precision, self.block_size).build(features)
+        self.codes = np.concatenate([self.codes, new_rows.codes])
+        if self.scales is not None:
+            self.scales = np.concatenate([self.scales, new_rows.scales])
+        return self
+    
+    def vector(self, idx):
+        """Return the decoded float32 vector of row idx."""
+        vector = self.codes[idx].astype(np.float32)
+        if self.scales is not None:
+            vector *= self.scales[idx]
+        return vector
+    
+    def score(self, query, rows=None):
+        """
+        Score every stored vector against one or more query vectors.
+        
+        Parameters:
+        -----------
+        query : numpy.ndarray
+            A 1-D float vector of dimension d, or a (d, n_queries) matrix of
+            query vectors scored in the same pass
+        rows : numpy.ndarray, optional
+            Positions of the stored vectors to score. Defaults to all of them.
+            
+        Returns:
+        --------
+        numpy.ndarray
+            float32 dot products, one per scored vector (one row per scored
+            vector and one column per query for a query matrix)
+        """
+        query = np.asarray(query, dtype=np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        if codes.dtype == np.float32:
+            return codes @ query
+        
+        scores = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            scores[start:start + self.block_size] = codes[start:start + self.block_size].astype(np.float32) @ query
+        if self.scales is not None:
+            scales = self.scales if rows is None else self.scales[rows]
+            scores *= scales.reshape((-1,) + (1,) * (query.ndim - 1))
+        return scores
+    
+    @property
+    def nbytes(self):
+        """Memory used by the stored codes and scales in bytes."""
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+    
+    def to_arrays(self):
+        """Return the arrays that define the store, for persistence."""
+        arrays = {'codes': self.codes}
+        if self.scales is not None:
+            arrays['scales'] = self.scales
+        return arrays
+    
+    @classmethod
+    def from_arrays(cls, arrays, precision, block_size=8192):
+        """Rebuild a store from the arrays returned by to_arrays()."""
+        store = cls(precision, block_size)
+        store.codes = arrays['codes']
+        store.scales = arrays.get('scales')
+        return store
+
+
+class ResultCache:
+    """
+    A thread-safe, bounded LRU cache with an optional time-to-live.
+    
+    MovieRecommendationSystem uses it to keep the ranked neighbors of recently
+    requested movies, keyed on (movie position, top_n, model version). Hits,
+    misses, evictions and expirations are counted for monitoring.
+    
+    Parameters:
+    -----------
+    max_entries : int, default=1024
+        Number of entries kept before the least recently used one is evicted
+    ttl : float, optional
+        Seconds after which an entry expires. Entries never expire by default.
+    """
+    
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Return the cache size and counters, including the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class StageProfiler:
+    """
+    A thread-safe recorder of the time and memory used by pipeline stages.
+    
+    Each stage run produces a record with its wall time, the CPU time of the
+    process (which includes BLAS threads and, under concurrent requests, other
+    threads), the peak RSS at its end and how much it raised that peak, plus
+    any fields the stage adds, such as the shapes and nnz of the matrices it
+    built. The most recent records are kept, totals are kept per stage, and
+    every record is logged as one JSON line at INFO level on the
+    'movie_recommendation_system.stages' logger.
+    
+    Parameters:
+    -----------
+    max_records : int, default=1000
+        Number of recent stage records kept
+    """
+    
+    logger = logging.getLogger(f"{__name__}.stages")
+    
+    def __init__(self, max_records=1000):
+        self.records = deque(maxlen=max_records)
+        self.totals = {}
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        # Locks cannot be pickled, e.g. to send a model to a worker process
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        Record the code run inside the with-block as one stage.
+        
+        Parameters:
+        -----------
+        name : str
+            Stage name, dotted for sub-steps (e.g. 'preprocessing.genres')
+        **fields
+            Extra fields of the record
+            
+        Yields:
+        -------
+        dict
+            The record, to which the block can add fields
+        """
+        record = {'stage': name, **fields}
+        start_peak = _peak_rss_mb()
+        start_time = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        except Exception as error:
+            record['error'] = type(error).__name__
+            raise
+        finally:
+            record['wall_seconds'] = time.perf_counter() - start_time
+            record['cpu_seconds'] = time.process_time() - start_cpu
+            record['peak_rss_mb'] = _peak_rss_mb()
+            if start_peak is not None:
+                record['peak_rss_growth_mb'] = record['peak_rss_mb'] - start_peak
+            record['finished_at'] = time.time()
+            self._add(record)
+    
+    def _add(self, record):
+        with self._lock:
+            self.records.append(record)
+            totals = self.totals.setdefault(record['stage'], {
+                'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_wall_seconds': 0.0
+            })
+            totals['calls'] += 1
+            totals['errors'] += 'error' in record
+            totals['wall_seconds'] += record['wall_seconds']
+            totals['cpu_seconds'] += record['cpu_seconds']
+            totals['max_wall_seconds'] = max(totals['max_wall_seconds'], record['wall_seconds'])
+            totals['last'] = record
+        
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(record, default=str))
+    
+    def summary(self):
+        """Return the totals of every stage, with its last record, keyed by stage name."""
+        with self._lock:
+            return {name: dict(totals) for name, totals in self.totals.items()}
+    
+    def clear(self):
+        """Drop the records and totals."""
+        with self._lock:
+            self.records.clear()
+            self.totals.clear()
+
+
+class TitleSearchIndex:
+    """
+    An in-memory title search index for autocomplete and typo-tolerant suggestions.
+    
+    Titles are normalized (lowercased, punctuation collapsed to spaces) and kept
+    in a sorted array, so prefix lookups are two binary searches. A character
+    trigram inverted index ranks fuzzy matches by the Dice coefficient of their
+    trigram sets, counted for all candidates at once with np.bincount.
+    
+    Parameters:
+    -----------
+    titles : iterable of str
+        Movie titles in catalog order. Missing titles are skipped.
+    """
+    
+    _NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+    
+    def __init__(self, titles):
+        groups = {}
+        for position, title in enumerate(titles):
+            if isinstance(title, str):
+                key = self.normalize(title)
+                if key:
+                    groups.setdefault(key, []).append(position)
+        
+        # Sorted unique keys for prefix search; positions stay in catalog order
+        self.keys = np.array(sorted(groups), dtype=object)
+        self.positions = [np.array(groups[key], dtype=np.int64) for key in self.keys]
+        
+        postings = {}
+        self.gram_counts = np.empty(len(self.keys), dtype=np.int32)
+        for key_id, key in enumerate(self.keys):
+            grams = self.trigrams(key)
+            self.gram_counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+    
+    @classmethod
+    def normalize(cls, text):
+        """Lowercase text and collapse runs of non-alphanumeric characters to single spaces."""
+        return cls._NON_ALPHANUMERIC.sub(' ', text.lower()).strip()
+    
+    @staticmethod
+    def trigrams(key):
+        """Return the set of character trigrams of a normalized key, padded at word boundaries."""
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    def prefix(self, query, limit=10):
+        """
+        Find titles starting with query.
+        
+        Parameters:
+        -----------
+        query : str
+            Title prefix
+        limit : int, default=10
+            Maximum number of titles to return
+            
+        Returns:
+        --------
+        list of int
+            Ids of the matching normalized titles in alphabetical order
+        """
+        key = self.normalize(query)
+        if not key:
+            return []
+        start = np.searchsorted(self.keys, key, side='left')
+        stop = np.searchsorted(self.keys, key + '\uffff', side='right')
+        return list(range(start, min(stop, start + limit)))
+    
+    def search(self, query, limit=10, min_score=0.3):
+        """
+        Rank titles by similarity to query.
+        
+        Exact title matches rank first, then titles starting with the query,
+        then titles containing it, each group ordered by trigram similarity.
+        
+        Parameters:
+        -----------
+        query : str
+            Free-text query, possibly misspelled
+        limit : int, default=10
+            Maximum number of titles to return
+        min_score : float, default=0.3
+            Minimum trigram similarity for matches that do not contain the query
+            
+        Returns:
+        --------
+        list of tuple
+            (title_id, score) pairs ordered from best to worst match
+        """
+        key = self.normalize(query)
+        if not key:
+            return []
+        
+        grams = self.trigrams(key)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        candidate_ids = np.array(self.prefix(key, limit), dtype=np.int64)
+        if lists:
+            hits = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+            candidate_ids = np.union1d(candidate_ids, np.flatnonzero(hits))
+        else:
+            hits = np.zeros(len(self.keys), dtype=np.int64)
+        
+        if len(candidate_ids) == 0:
+            return []
+        
+        scores = 2 * hits[candidate_ids] / (len(grams) + self.gram_counts[candidate_ids])
+        keys = self.keys[candidate_ids]
+        boosts = np.array([
+            3.0 if candidate == key else 2.0 if candidate.startswith(key) else 1.0 if key in candidate else 0.0
+            for candidate in keys
+        ])
+        keep = (boosts > 0) | (scores >= min_score)
+        ranking = boosts[keep] + scores[keep]
+        candidate_ids = candidate_ids[keep]
+        
+        order = MovieRecommendationSystem._top_k(ranking, limit)
+        return [(int(candidate_ids[i]), float(ranking[i])) for i in order]
+
+
+class FilterIndex:
+    """
+    Precompiled metadata columns for filtering recommendations.
+    
+    Every genre has a boolean mask over the catalog, and the release year,
+    rating and runtime are kept as float32 columns, so a filter compiles to a
+    single mask of allowed movies with a few vectorized comparisons. Compiled
+    masks of recently used filters are cached.
+    
+    Supported filters are 'genres' (a movie passes if it has any of the listed
+    genres) and the inclusive bounds 'min_year', 'max_year', 'min_rating',
+    'max_rating', 'min_runtime' and 'max_runtime'. Movies with a missing value
+    never pass a bound on it.
+    
+    Parameters:
+    -----------
+    movies_df : pandas.DataFrame
+        Catalog in row-position order with 'genre_names', 'release_date',
+        'vote_average' and, optionally, 'runtime' columns
+    max_cached_masks : int, default=64
+        Number of compiled masks kept
+    """
+    
+    RANGE_FILTERS = {
+        'min_year': ('year', np.greater_equal),
+        'max_year': ('year', np.less_equal),
+        'min_rating': ('vote_average', np.greater_equal),
+        'max_rating': ('vote_average', np.less_equal),
+        'min_runtime': ('runtime', np.greater_equal),
+        'max_runtime': ('runtime', np.less_equal)
+    }
+    
+    def __init__(self, movies_df, max_cached_masks=64):
+        self.n_movies = len(movies_df)
+        
+        genre_lists = movies_df['genre_names'].map(lambda genres: genres if isinstance(genres, list) else [])
+        positions = np.repeat(np.arange(self.n_movies), genre_lists.map(len).to_numpy())
+        codes, genres = pd.factorize(pd.Series([genre.lower() for genres in genre_lists for genre in genres],
+                                               dtype=object))
+        self.genre_masks = {}
+        for code, genre in enumerate(genres):
+            mask = np.zeros(self.n_movies, dtype=bool)
+            mask[positions[codes == code]] = True
+            self.genre_masks[genre] = mask
+        
+        self.columns = {
+            'year': pd.to_datetime(movies_df['release_date'], errors='coerce').dt.year.to_numpy(
+                dtype=np.float32, na_value=np.nan
+            ),
+            'vote_average': pd.to_numeric(movies_df['vote_average'], errors='coerce').to_numpy(dtype=np.float32)
+        }
+        if 'runtime' in movies_df.columns:
+            self.columns['runtime'] = pd.to_numeric(movies_df['runtime'], errors='coerce').to_numpy(dtype=np.float32)
+        
+        self._masks = ResultCache(max_entries=max_cached_masks)
+    
+    def compile(self, filters):
+        """
+        Validate a filter dict and return its canonical, hashable key.
+        
+        Parameters:
+        -----------
+        filters : dict or None
+            Filter names mapped to values; None values are ignored
+            
+        Returns:
+        --------
+        tuple or None
+            Sorted (name, value) pairs, or None if nothing is filtered
+        """
+        items = []
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name == 'genres':
+                genres = [value] if isinstance(value, str) else value
+                items.append((name, tuple(sorted({genre.lower() for genre in genres}))))
+            elif name in self.RANGE_FILTERS:
+                column = self.RANGE_FILTERS[name][0]
+                if column not in self.columns:
+                    raise ValueError(f"The catalog has no '{column}' column to filter on.")
+                items.append((name, float(value)))
+            else:
+                raise ValueError(f"Unknown filter: '{name}'")
+        return tuple(sorted(items)) or None
+    
+    def mask(self, key):
+        """
+        Return the read-only mask of the movies that pass a compiled filter.
+        
+        Parameters:
+        -----------
+        key : tuple
+            A key returned by compile()
+            
+        Returns:
+        --------
+        numpy.ndarray
+            Boolean mask over the catalog
+        """
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.ones(self.n_movies, dtype=bool)
+            for name, value in key:
+                if name == 'genres':
+                    genre_mask = np.zeros(self.n_movies, dtype=bool)
+                    for genre in value:
+                        if genre in self.genre_masks:
+                            genre_mask |= self.genre_masks[genre]
+                    mask &= genre_mask
+                else:
+                    column, compare = self.RANGE_FILTERS[name]
+                    mask &= compare(self.columns[column], value)
+            mask.setflags(write=False)
+            self._masks.put(key, mask)
+        return mask
+
+
+class CollaborativeFilteringModel:
+    """
+    Implicit-feedback matrix factorization trained on user ratings.
+    
+    Ratings are read from a MovieLens-style CSV (userId, movieId, rating) in
+    chunks of int32 ids and float32 ratings and assembled into a CSR users x
+    movies matrix. Each rating is treated as implicit feedback with confidence
+    1 + alpha * rating (Hu, Koren and Volinsky, 2008), and the user and movie
+    factors are fitted by alternating least squares. Every half-step updates
+    the rows in blocks of about block_ratings ratings with a few conjugate
+    gradient steps, warm-started from the previous factors, and the blocks are
+    solved on a thread pool. The cost of an iteration is linear in the number
+    of ratings, no per-user k x k system is ever formed, and the working memory
+    of a block is bounded by block_ratings however popular its movies are.
+    
+    Parameters:
+    -----------
+    factors : int, default=64
+        Number of latent factors
+    regularization : float, default=0.05
+        L2 regularization of the factors
+    alpha : float, default=10.0
+        Confidence scale of a rating
+    iterations : int, default=15
+        Number of ALS iterations (one user and one movie update each)
+    cg_steps : int, default=3
+        Conjugate gradient steps per row and half-step
+    block_ratings : int, default=250000
+        Approximate number of ratings per block of rows solved together (a
+        block always holds at least one row)
+    n_jobs : int, default=-1
+        Number of solver threads (-1 uses all cores)
+    random_state : int, default=0
+        Seed of the initial movie factors
+    """
+    
+    ARTIFACT_FORMAT_VERSION = 1
+    ARTIFACT_ARRAYS = ('user_factors', 'item_factors', 'user_ids', 'movie_ids', 'tmdb_ids')
+    
+    def __init__(self, factors=64, regularization=0.05, alpha=10.0, iterations=15, cg_steps=3,
+                 block_ratings=250000, n_jobs=-1, random_state=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.block_ratings = block_ratings
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.ratings = None
+        self.user_ids = None
+        self.movie_ids = None
+        self.tmdb_ids = None
+        self.user_factors = None
+        self.item_factors = None
+        self.load_report = None
+        self.training_report = None
+    
+    def load_ratings(self, path, chunksize=1000000, min_rating=None):
+        """
+        Read a ratings CSV into a sparse users x movies matrix.
+        
+        Only the userId, movieId and rating columns are parsed, chunk by chunk,
+        as int32 and float32 arrays. Users and movies are numbered in ascending
+        id order and the raw ids are kept in user_ids and movie_ids.
+        
+        Parameters:
+        -----------
+        path : str
+            Path to the ratings CSV file
+        chunksize : int, default=1000000
+            Number of rows parsed at a time
+        min_rating : float, optional
+            Ratings below this value are dropped
+            
+        Returns:
+        --------
+        CollaborativeFilteringModel
+            The model itself
+        """
+        start_time = time.perf_counter()
+        print(f"Loading ratings from {path}...")
+        
+        users, movies, values = [], [], []
+        reader = pd.read_csv(path, usecols=['userId', 'movieId', 'rating'], chunksize=chunksize,
+                             dtype={'userId': np.int32, 'movieId': np.int32, 'rating': np.float32})
+        for chunk in reader:
+            if min_rating is not None:
+                chunk = chunk[chunk['rating'] >= min_rating]
+            users.append(chunk['userId'].to_numpy())
+            movies.append(chunk['movieId'].to_numpy())
+            values.append(chunk['rating'].to_numpy())
+        
+        # Number users and movies by ascending id, encoding one chunk at a time as int32
+        self.user_ids = np.unique(np.concatenate([np.unique(chunk) for chunk in users]))
+        user_index = np.concatenate([np.searchsorted(self.user_ids, chunk).astype(np.int32) for chunk in users])
+        del users
+        self.movie_ids = np.unique(np.concatenate([np.unique(chunk) for chunk in movies]))
+        movie_index = np.concatenate([np.searchsorted(self.movie_ids, chunk).astype(np.int32) for chunk in movies])
+        del movies
+        
+        self.ratings = csr_matrix(
+            (np.concatenate(values), (user_index, movie_index)),
+            shape=(len(self.user_ids), len(self.movie_ids)), dtype=np.float32
+        )
+        self.ratings.sum_duplicates()
+        self.tmdb_ids = None
+        
+        self.load_report = {
+            'ratings': int(self.ratings.nnz),
+            'users': len(self.user_ids),
+            'movies': len(self.movie_ids),
+            'seconds': time.perf_counter() - start_time,
+            'matrix_mb': (self.ratings.data.nbytes + self.ratings.indices.nbytes
+                          + self.ratings.indptr.nbytes) / (1024 * 1024),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+        print(f"Loaded {self.ratings.nnz} ratings from {len(self.user_ids)} users "
+              f"on {len(self.movie_ids)} movies in {self.load_report['seconds']:.1f}s.")
+        return self
+    
+    def load_links(self, path):
+        """
+        Map the MovieLens movie ids to TMDB ids with a links CSV.
+        
+        The TMDB id is the 'id' column of movies_metadata.csv, so the mapping
+        lets collaborative recommendations be joined with the movie catalog.
+        
+        Parameters:
+        -----------
+        path : str
+            Path to the links CSV file (movieId, imdbId, tmdbId)
+            
+        Returns:
+        --------
+        CollaborativeFilteringModel
+            The model itself
+        """
+        links = pd.read_csv(path, usecols=['movieId', 'tmdbId'])
+        links = links.dropna().drop_duplicates('movieId').set_index('movieId')['tmdbId']
+        self.tmdb_ids = links.reindex(self.movie_ids).fillna(-1).to_numpy(dtype=np.int32)
+        print(f"Linked {(self.tmdb_ids >= 0).sum()} of {len(self.movie_ids)} movies to TMDB ids.")
+        return self
+    
+    def fit(self, ratings=None):
+        """
+        Train the user and movie factors with alternating least squares.
+        
+        Parameters:
+        -----------
+        ratings : scipy.sparse matrix, optional
+            A users x movies ratings matrix to train on instead of the one
+            read by load_ratings()
+            
+        Returns:
+        --------
+        CollaborativeFilteringModel
+            The fitted model
+        """
+        if ratings is not None:
+            self.ratings = csr_matrix(ratings, dtype=np.float32)
+        if self.ratings is None:
+            raise ValueError("No ratings loaded. Call load_ratings() first.")
+        
+        start_time = time.perf_counter()
+        n_users, n_movies = self.ratings.shape
+        print(f"Training {self.factors} factors on {self.ratings.nnz} ratings...")
+        
+        # The solver only needs the confidence above 1 of each observed rating, by user and by movie
+        confidence = self.ratings.copy()
+        confidence.data *= np.float32(self.alpha)
+        confidence_by_movie = confidence.T.tocsr()
+        
+        rng = np.random.default_rng(self.random_state)
+        self.user_factors = np.zeros((n_users, self.factors), dtype=np.float32)
+        self.item_factors = (rng.standard_normal((n_movies, self.factors)) * 0.01).astype(np.float32)
+        
+        iteration_seconds = []
+        for iteration in range(self.iterations):
+            iteration_start = time.perf_counter()
+            self._least_squares(confidence, self.user_factors, self.item_factors)
+            self._least_squares(confidence_by_movie, self.item_factors, self.user_factors)
+            iteration_seconds.append(time.perf_counter() - iteration_start)
+            print(f"ALS iteration {iteration + 1}/{self.iterations} took {iteration_seconds[-1]:.1f}s")
+        
+        self.training_report = {
+            'factors': self.factors,
+            'iterations': self.iterations,
+            'cg_steps': self.cg_steps,
+            'seconds': time.perf_counter() - start_time,
+            'seconds_per_iteration': float(np.mean(iteration_seconds)) if iteration_seconds else 0.0,
+            'factors_mb': (self.user_factors.nbytes + self.item_factors.nbytes) / (1024 * 1024),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+        print(f"Training finished in {self.training_report['seconds']:.1f}s.")
+        return self
+    
+    def _least_squares(self, confidence, factors, fixed_factors):
+        """Update every row of factors for fixed_factors, one block of rows per task."""
+        gram = fixed_factors.T @ fixed_factors
+        gram[np.diag_indices_from(gram)] += self.regularization
+        
+        # Cut the rows into contiguous blocks of about block_ratings ratings each
+        targets = np.arange(0, confidence.nnz, self.block_ratings)
+        starts = np.unique(np.concatenate([[0], np.searchsorted(confidence.indptr, targets, side='right') - 1]))
+        stops = np.append(starts[1:], factors.shape[0])
+        
+        # Blocks write disjoint rows of factors, so the threads share it without locking
+        Parallel(n_jobs=self.n_jobs, require='sharedmem')(
+            delayed(self._solve_block)(confidence, factors, fixed_factors, gram, start, stop)
+            for start, stop in zip(starts, stops)
+        )
+    
+    def _solve_block(self, confidence, factors, fixed_factors, gram, start, stop):
+        """
+        Run batched conjugate gradient for the rows start:stop of factors.
+        
+        Row u solves (Y^T Y + Y^T (C_u - I) Y + regularization * I) x_u = Y^T C_u p_u,
+        where Y is fixed_factors, C_u the confidences of the row and p_u its
+        observed entries. Only the observed entries enter the sparse terms.
+        """
+        block = confidence[start:stop]
+        shape = block.shape
+        rows = np.repeat(np.arange(shape[0]), np.diff(block.indptr))
+        observed = fixed_factors[block.indices]
+        
+        def apply(vectors):
+            # A x for every row: the dense Gram term plus the observed entries weighted by confidence - 1
+            weights = block.data * np.einsum('ij,ij->i', observed, vectors[rows])
+            return vectors @ gram + csr_matrix((weights, block.indices, block.indptr), shape=shape) @ fixed_factors
+        
+        targets = csr_matrix((block.data + 1, block.indices, block.indptr), shape=shape) @ fixed_factors
+        solution = factors[start:stop].copy()
+        residual = targets - apply(solution)
+        direction = residual.copy()
+        residual_norm = np.einsum('ij,ij->i', residual, residual)
+        
+        for _ in range(self.cg_steps):
+            product = apply(direction)
+            curvature = np.einsum('ij,ij->i', direction, product)
+            step = np.divide(residual_norm, curvature, out=np.zeros_like(residual_norm), where=curvature > 0)
+            solution += step[:, None] * direction
+            residual -= step[:, None] * product
+            new_residual_norm = np.einsum('ij,ij->i', residual, residual)
+            beta = np.divide(new_residual_norm, residual_norm, out=np.zeros_like(residual_norm),
+                             where=residual_norm > 0)
+            direction = residual + beta[:, None] * direction
+            residual_norm = new_residual_norm
+        
+        factors[start:stop] = solution
+    
+    def recommend(self, user_id, top_n=10, exclude_seen=True):
+        """
+        Return the top-N movies for a user.
+        
+        Parameters:
+        -----------
+        user_id : int
+            Raw user id from the ratings file
+        top_n : int, default=10
+            Number of movies to return
+        exclude_seen : bool, default=True
+            If True, movies the user has rated are never returned
+            
+        Returns:
+        --------
+        pandas.DataFrame
+            movieId (and tmdbId when links are loaded) and score of the
+            recommended movies, best first
+        """
+        if self.user_factors is None:
+            raise ValueError("The model must be fitted before it can recommend.")
+        row = np.searchsorted(self.user_ids, user_id)
+        if row >= len(self.user_ids) or self.user_ids[row] != user_id:
+            raise ValueError(f"Unknown user id: {user_id}")
+        
+        scores = self.item_factors @ self.user_factors[row]
+        if exclude_seen and self.ratings is not None:
+            scores[self.ratings.indices[self.ratings.indptr[row]:self.ratings.indptr[row + 1]]] = -np.inf
+        
+        top = MovieRecommendationSystem._top_k(scores, top_n)
+        top = top[np.isfinite(scores[top])]
+        
+        recommendations = pd.DataFrame({'movieId': self.movie_ids[top], 'score': scores[top]})
+        if self.tmdb_ids is not None:
+            recommendations.insert(1, 'tmdbId', self.tmdb_ids[top])
+        return recommendations
+    
+    def save(self, path):
+        """
+        Persist the fitted model to a directory.
+        
+        The factors and id arrays are written as .npy files that load() can
+        memory-map, the ratings matrix (used to exclude seen movies) as .npz,
+        and manifest.json last.
+        
+        Parameters:
+        -----------
+        path : str
+            Directory to write the artifact to (created if missing)
+            
+        Returns:
+        --------
+        dict
+            The manifest that was written
+        """
+        if self.user_factors is None:
+            raise ValueError("The model must be fitted before it can be saved.")
+        
+        print(f"Saving collaborative filtering model to {path}...")
+        os.makedirs(path, exist_ok=True)
+        
+        arrays = {}
+        for name in self.ARTIFACT_ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                arrays[name] = f"{name}.npy"
+                np.save(os.path.join(path, arrays[name]), np.ascontiguousarray(array))
+        if self.ratings is not None:
+            save_npz(os.path.join(path, 'ratings.npz'), self.ratings)
+        
+        manifest = {
+            'format_version': self.ARTIFACT_FORMAT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': {
+                'factors': self.factors,
+                'regularization': self.regularization,
+                'alpha': self.alpha,
+                'iterations': self.iterations,
+                'cg_steps': self.cg_steps
+            },
+            'arrays': arrays,
+            'ratings': 'ratings.npz' if self.ratings is not None else None,
+            'load_report': self.load_report,
+            'training_report': self.training_report
+        }
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        print("Collaborative filtering model saved.")
+        return manifest
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a model written by save().
+        
+        Parameters:
+        -----------
+        path : str
+            Directory of the artifact
+        mmap : bool, default=True
+            If True, memory-map the factor arrays instead of reading them
+            
+        Returns:
+        --------
+        CollaborativeFilteringModel
+            The loaded model
+        """
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] != cls.ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format version: {manifest['format_version']}")
+        
+        model = cls(**manifest['params'])
+        for name, filename in manifest['arrays'].items():
+            setattr(model, name, np.load(os.path.join(path, filename), mmap_mode='r' if mmap else None))
+        if manifest['ratings']:
+            model.ratings = load_npz(os.path.join(path, manifest['ratings'])).tocsr()
+        model.load_report = manifest['load_report']
+        model.training_report = manifest['training_report']
+        return model
+
+
 class MovieRecommendationSystem:
     """
     A class implementing a content-based movie recommendation system using TF-IDF and cosine similarity.
     Follows a modular pipeline architecture with distinct components.
     """
     
+    # Version of the on-disk layout written by save() and accepted by load()
+    ARTIFACT_FORMAT_VERSION = 1
+    
+    # Arrays persisted by save() when they have been computed
+    ARTIFACT_ARRAYS = ('reduced_features', 'normalized_features', 'cosine_sim',
+                       'neighbor_indices', 'neighbor_scores', 'removed_mask',
+                       'collaborative_features', 'has_collaborative')
+    
+    # Sparse matrices persisted by save() for the evaluation framework
+    ARTIFACT_SPARSE = ('genres_sparse', 'genre_tfidf_matrix')
+    
+    # Columns read by streaming ingestion and the compact dtype of each
+    INGESTION_DTYPES = {
+        'id': 'int32',
+        'title': 'object',
+        'genres': 'category',
+        'belongs_to_collection': 'category',
+        'overview': 'object',
+        'budget': 'float64',
+        'revenue': 'float64',
+        'runtime': 'float32',
+        'vote_average': 'float32',
+        'release_date': 'object'
+    }
+    
+    # Movie columns needed to render, filter and evaluate recommendations
+    DISPLAY_COLUMNS = ['id', 'title', 'genre_names', 'vote_average', 'release_date',
+                       'runtime', 'overview', 'genre_features']
+    
+    # Filters passing at most this fraction of the catalog are scored on the passing movies only
+    FILTER_SUBSET_FRACTION = 0.25
+    
     def __init__(self):
         """Initialize the recommendation system components."""
         self.movies_df = None
+        self.source_columns = None
+        self.ingestion_report = None
+        self.preprocessing_report = None
+        self.svd_report = None
         self.tfidf_matrix = None
         self.genres_sparse = None
         self.numerical_sparse = None
         self.collection_sparse = None
+        self.genre_tfidf_matrix = None
         self.reduced_features = None
+        self.normalized_features = None
+        self.cosine_sim = None
+        self.neighbor_indices = None
+        self.neighbor_scores = None
+        self.ann_backend = None
+        self.title_index = None
+        self.title_search = None
+        self.filter_index = None
+        self.removed_mask = None
+        self.embedding_store = None
+        self.rerank_candidates = 0
+        self.embedding_report = None
+        self.collaborative_features = None
+        self.has_collaborative = None
+        self.collaborative_weight = 0.0
+        self.hybrid_candidates = 100
+        self.transformers = {}
+        self.similarity_mode = 'dense'
+        self.model_version = None
+        self.result_cache = ResultCache()
+        self.profiler = StageProfiler()
+        
+    def _update_model_version(self):
+        """
+        Give the model a new version id.
+        
+        Called after every step that can change recommendation results, so
+        anything cached from an older model (rendered images, query results)
+        can be told apart from fresh results.
+        """
+        self.model_version = f"{time.strftime('%Y%m%d%H%M%S')}-{os.urandom(4).hex()}"
+        
+        # Cached results belong to the previous version
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        return self.model_version
+    
+    def data_ingestion(self, filepath, streaming=False, chunksize=10000, trace_memory=False):
+        """
+        Data Ingestion Module: Handles reading and initial parsing of the movie metadata CSV.
+        
+        Parameters:
+        -----------
+        filepath : str
+            Path to the movie metadata CSV file
+        streaming : bool, default=False
+            If True, read only the columns listed in INGESTION_DTYPES in chunks,
+            convert each chunk to compact dtypes (category/float32/int32) and drop
+            malformed rows whose id is not numeric. If False, load every column
+            with pd.read_csv as before.
+        chunksize : int, default=10000
+            Number of rows per chunk in streaming mode
+        trace_memory : bool, default=False
+            If True, record the peak Python/NumPy allocation during ingestion with
+            tracemalloc (slower, but isolates ingestion from the rest of the process)
+            
+        Returns:
+        --------
+        pandas.DataFrame
+            The loaded movies dataframe
+        """
+        print("Loading movie data...")
+        
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start_time = time.perf_counter()
+        
+        dropped_rows = 0
+        with self.profiler.stage('data_ingestion', streaming=streaming) as stage:
+            if streaming:
+                self.movies_df, dropped_rows = self._read_movies_in_chunks(filepath, chunksize)
+            else:
+                self.movies_df = pd.read_csv(filepath, low_memory=False)
+            stage['shape'] = list(self.movies_df.shape)
+        
+        self.source_columns = list(self.movies_df.columns)
+        self.ingestion_report = {
+            'streaming': streaming,
+            'rows': len(self.movies_df),
+            'dropped_rows': dropped_rows,
+            'columns': len(self.movies_df.columns),
+            'seconds': time.perf_counter() - start_time,
+            'dataframe_mb': self.movies_df.memory_usage(deep=True).sum() / (1024 * 1024),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+        if trace_memory:
+            self.ingestion_report['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        if started_tracing:
+            tracemalloc.stop()
+        
+        print(f"Loaded {len(self.movies_df)} movies.")
+        if dropped_rows:
+            print(f"Dropped {dropped_rows} malformed rows.")
+        print(f"Ingestion took {self.ingestion_report['seconds']:.2f}s; "
+              f"dataframe uses {self.ingestion_report['dataframe_mb']:.1f} MB.")
+        return self.movies_df
+    
+    def _read_movies_in_chunks(self, filepath, chunksize):
+        """
+        Read the columns in INGESTION_DTYPES chunk by chunk with compact dtypes.
+        
+        Every column is read as text so that malformed rows cannot break the
+        parser, then converted per chunk. Rows whose id is not numeric (the
+        shifted rows in the Kaggle export) are dropped.
+        
+        Parameters:
+        -----------
+        filepath : str
+            Path to the movie metadata CSV file
+        chunksize : int
+            Number of rows per chunk
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (movies_dataframe, number_of_dropped_rows)
+        """
+        frames = []
+        dropped_rows = 0
+        
+        for chunk in pd.read_csv(filepath, usecols=list(self.INGESTION_DTYPES), dtype=str, chunksize=chunksize):
+            ids = pd.to_numeric(chunk['id'], errors='coerce')
+            valid = ids.notna()
+            dropped_rows += int((~valid).sum())
+            chunk = chunk[valid]
+            
+            columns = {}
+            for column, dtype in self.INGESTION_DTYPES.items():
+                if column == 'id':
+                    columns[column] = ids[valid].astype(dtype)
+                elif dtype.startswith(('float', 'int')):
+                    columns[column] = pd.to_numeric(chunk[column], errors='coerce').astype(dtype)
+                else:
+                    columns[column] = chunk[column].astype(dtype)
+            frames.append(pd.DataFrame(columns))
+        
+        # Categories differ between chunks, so merge them instead of falling back to object
+        categorical = [column for column, dtype in self.INGESTION_DTYPES.items() if dtype == 'category']
+        movies_df = pd.concat([frame.drop(columns=categorical) for frame in frames], ignore_index=True)
+        for column in categorical:
+            movies_df[column] = union_categoricals([frame[column] for frame in frames])
+        
+        return movies_df[list(self.INGESTION_DTYPES)], dropped_rows
+    
+    @_profiled('preprocessing_pipeline')
+    def preprocessing_pipeline(self, n_jobs=1):
+        """
+        Preprocessing Pipeline: Manages data cleaning, type conversion, and feature extraction.
+        
+        This method handles:
+        - Genre extraction and encoding
+        - Collection information extraction
+        - Text processing for movie overviews
+        - Numerical feature normalization
+        
+        Categorical features are built directly as sparse matrices, and the time,
+        sparse feature size and peak RSS are recorded in preprocessing_report.
+        Each step is also recorded as a profiler stage with its matrix shape.
+        
+        Parameters:
+        -----------
+        n_jobs : int, default=1
+            Number of worker processes used to parse the nested genre and
+            collection fields when they have many distinct values
+        
+        Returns:
+        --------
+        tuple
+            A tuple containing the processed features: (genres_sparse, tfidf_matrix, numerical_sparse, collection_sparse)
+        """
+        print("Starting preprocessing pipeline...")
+        start_time = time.perf_counter()
+        
+        # 1. Process Genres
+        print("Processing genres...")
+        with self.profiler.stage('preprocessing.genres') as stage:
+            # Convert genres from string to list of dictionaries, parsing each distinct string once
+            self.movies_df['genres'] = _parse_column(self.movies_df['genres'], _parse_genres, n_jobs=n_jobs)
+            
+            # Extract genre names
+            self.movies_df['genre_names'] = self.movies_df['genres'].apply(
+                lambda x: [genre['name'] for genre in x]
+            )
+            
+            # Create binary genre features directly as a sparse matrix
+            mlb = MultiLabelBinarizer(sparse_output=True)
+            self.genres_sparse = mlb.fit_transform(self.movies_df['genre_names']).tocsr()
+            self.transformers['genre_binarizer'] = mlb
+            stage['genres_sparse'] = _describe_matrix(self.genres_sparse)
+        
+        # 2. Process Collection Information
+        print("Processing collection information...")
+        with self.profiler.stage('preprocessing.collections') as stage:
+            # Extract collection names, parsing each distinct string once
+            self.movies_df['collection_name'] = _parse_column(
+                self.movies_df['belongs_to_collection'], _parse_collection_name, n_jobs=n_jobs
+            )
+            
+            # One column per collection, in sorted name order
+            collection_codes, collection_columns = pd.factorize(self.movies_df['collection_name'], sort=True)
+            
+            # Build the sparse one-hot matrix with the weighting applied (collections are important signals)
+            self.collection_sparse = _one_hot(collection_codes, len(collection_columns), weight=2)
+            self.transformers['collection_columns'] = list(collection_columns)
+            stage['collection_sparse'] = _describe_matrix(self.collection_sparse)
+        
+        # 3. Process Textual Features (Overview)
+        print("Processing textual features...")
+        with self.profiler.stage('preprocessing.overview_tfidf') as stage:
+            # Fill NaN values in 'overview' column with an empty string
+            self.movies_df['overview'] = self.movies_df['overview'].fillna("")
+            
+            # Initialize TF-IDF vectorizer and transform overviews
+            tfidf = TfidfVectorizer(stop_words='english')
+            self.tfidf_matrix = tfidf.fit_transform(self.movies_df['overview'])
+            self.transformers['overview_tfidf'] = tfidf
+            stage['tfidf_matrix'] = _describe_matrix(self.tfidf_matrix)
+        
+        # 4. Process Numerical Features
+        print("Processing numerical features...")
+        with self.profiler.stage('preprocessing.numerical') as stage:
+            # Select numerical features
+            numerical_features = ['budget', 'revenue', 'runtime']
+            numerical_df = self.movies_df[numerical_features].apply(pd.to_numeric, errors='coerce')
+            
+            # Replace 0s with the median to avoid zero-impact
+            self.transformers['numerical_zero_fill'] = numerical_df.median()
+            numerical_df = numerical_df.replace(0, self.transformers['numerical_zero_fill'])
+            
+            # Fill any remaining NaN values with the median
+            self.transformers['numerical_nan_fill'] = numerical_df.median()
+            numerical_df = numerical_df.fillna(self.transformers['numerical_nan_fill'])
+            
+            # Normalize numerical features
+            scaler = StandardScaler()
+            normalized_numerical_df = pd.DataFrame(
+                scaler.fit_transform(numerical_df),
+                columns=numerical_df.columns
+            )
+            self.transformers['numerical_scaler'] = scaler
+            
+            # Convert to sparse matrix
+            self.numerical_sparse = csr_matrix(normalized_numerical_df.values)
+            
+            # Store the normalized features in the dataframe. The columns get a suffix
+            # so they do not shadow the raw ones and the frame can be appended to.
+            self.movies_df = pd.concat(
+                [self.movies_df, normalized_numerical_df.add_suffix('_normalized')], axis=1
+            )
+            stage['numerical_sparse'] = _describe_matrix(self.numerical_sparse)
+        
+        # Create genre_features field and its TF-IDF matrix for evaluation
+        with self.profiler.stage('preprocessing.genre_tfidf') as stage:
+            self.movies_df['genre_features'] = self.movies_df['genre_names'].apply(
+                lambda genres: ' '.join(genres) if isinstance(genres, list) else ''
+            )
+            genre_tfidf = TfidfVectorizer(stop_words='english')
+            self.genre_tfidf_matrix = genre_tfidf.fit_transform(self.movies_df['genre_features'])
+            self.transformers['genre_tfidf'] = genre_tfidf
+            stage['genre_tfidf_matrix'] = _describe_matrix(self.genre_tfidf_matrix)
+        
+        # Build the title lookup used by recommendation_service
+        with self.profiler.stage('preprocessing.title_index'):
+            self._build_title_index()
+        
+        self.preprocessing_report = {
+            'seconds': time.perf_counter() - start_time,
+            'sparse_mb': sum(
+                matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+                for matrix in [self.genres_sparse, self.tfidf_matrix, self.numerical_sparse, self.collection_sparse]
+            ) / (1024 * 1024),
+            'dataframe_mb': self.movies_df.memory_usage(deep=True).sum() / (1024 * 1024),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+        
+        print("Preprocessing complete.")
+        return (self.genres_sparse, self.tfidf_matrix, self.numerical_sparse, self.collection_sparse)
+    
+    def _build_title_index(self):
+        """
+        Build the lookup from lowercased title to the row positions carrying it.
+        
+        Duplicate titles share one entry whose positions are in catalog order,
+        so a lookup is a single dict access instead of lowercasing every title.
+        
+        Returns:
+        --------
+        dict
+            The title index
+        """
+        titles = self.movies_df['title'].str.lower().reset_index(drop=True)
+        if self.removed_mask is not None:
+            # Removed movies map to NaN, which groupby leaves out
+            titles = titles.where(~self.removed_mask)
+        self.title_index = titles.groupby(titles, sort=False).indices
+        return self.title_index
+    
+    def search_titles(self, query, limit=10):
+        """
+        Title Search: Finds catalog titles for autocomplete and "did you mean" suggestions.
+        
+        Matches are ranked by TitleSearchIndex, so exact and prefix matches come
+        first and misspelled queries still return the closest titles. The index
+        is built on first use.
+        
+        Parameters:
+        -----------
+        query : str
+            Full or partial movie title, possibly misspelled
+        limit : int, default=10
+            Maximum number of movies to return
+            
+        Returns:
+        --------
+        list of dict
+            Matching movies with their movie_id, title, release_date and score
+        """
+        if self.title_search is None:
+            self.title_search = TitleSearchIndex(self.movies_df['title'])
+        
+        results = []
+        for title_id, score in self.title_search.search(query, limit=limit):
+            for position in self.title_search.positions[title_id]:
+                if self.removed_mask is not None and self.removed_mask[position]:
+                    continue
+                movie = self.movies_df.iloc[position]
+                results.append({
+                    'movie_id': int(position),
+                    'title': movie['title'],
+                    'release_date': None if pd.isna(movie['release_date']) else movie['release_date'],
+                    'score': score
+                })
+                if len(results) == limit:
+                    return results
+        
+        return results
+    
+    @_profiled('similarity_engine')
+    def similarity_engine(self, n_components=2000, similarity_mode='dense', svd_algorithm='randomized',
+                          n_oversamples=10, n_iter=5, dtype='float64', variance_target=None, batch_size=None):
+        """
+        Similarity Engine: Computes and manages the similarity matrix.
+        
+        This method combines all features, performs dimensionality reduction, 
+        and calculates the similarity matrix. The fit time, explained variance
+        and memory of the dimensionality reduction are recorded in svd_report,
+        and each step is recorded as a profiler stage.
+        
+        Parameters:
+        -----------
+        n_components : int, default=2000
+            Number of components to keep in dimensionality reduction (the upper
+            bound when variance_target is given)
+        similarity_mode : {'dense', 'on_demand'}, default='dense'
+            'dense' precomputes the full N x N cosine similarity matrix.
+            'on_demand' keeps only the L2-normalized reduced features and scores
+            each query with a single matrix-vector product, which avoids the
+            quadratic memory cost of the dense matrix.
+        svd_algorithm : {'randomized', 'arpack', 'incremental'}, default='randomized'
+            'randomized' and 'arpack' are the TruncatedSVD solvers. 'incremental'
+            fits an IncrementalPCA over row batches, so only batch_size dense rows
+            are held in memory at a time (note that it centers the features).
+        n_oversamples : int, default=10
+            Extra random vectors used by the randomized solver
+        n_iter : int, default=5
+            Power iterations of the randomized solver; fewer is faster but less accurate
+        dtype : {'float64', 'float32'}, default='float64'
+            Precision of the features during the fit. float32 halves the memory
+            of the reduced features and of the similarity matrix.
+        variance_target : float, optional
+            If given, keep the smallest number of components (up to n_components)
+            whose cumulative explained variance ratio reaches this target
+        batch_size : int, optional
+            Rows per batch for the incremental solver (defaults to max(n_components, 1024))
+            
+        Returns:
+        --------
+        numpy.ndarray
+            The computed cosine similarity matrix, or the normalized feature
+            matrix when similarity_mode is 'on_demand'
+        """
+        if similarity_mode not in ('dense', 'on_demand'):
+            raise ValueError(f"Unknown similarity mode: '{similarity_mode}'")
+        if svd_algorithm not in ('randomized', 'arpack', 'incremental'):
+            raise ValueError(f"Unknown SVD algorithm: '{svd_algorithm}'")
+        
+        print("Building similarity engine...")
+        
+        # Ensure features are processed
+        if any(x is None for x in [self.genres_sparse, self.tfidf_matrix, 
+                                 self.numerical_sparse, self.collection_sparse]):
+            print("Features not processed. Running preprocessing pipeline...")
+            self.preprocessing_pipeline()
+        
+        # Combine all features
+        print("Combining features...")
+        with self.profiler.stage('similarity_engine.combine') as stage:
+            combined_features_sparse = hstack([
+                self.genres_sparse, 
+                self.tfidf_matrix,
+                self.numerical_sparse, 
+                self.collection_sparse
+            ]).tocsr().astype(dtype, copy=False)
+            stage['combined_features'] = _describe_matrix(combined_features_sparse)
+        
+        # Dimensionality reduction
+        print(f"Performing dimensionality reduction to {n_components} components "
+              f"({svd_algorithm}, {np.dtype(dtype).name})...")
+        start_time = time.perf_counter()
+        with self.profiler.stage('similarity_engine.svd', algorithm=svd_algorithm) as stage:
+            if svd_algorithm == 'incremental':
+                svd = IncrementalPCA(n_components=n_components, batch_size=batch_size or max(n_components, 1024))
+                self.reduced_features = svd.fit(combined_features_sparse).transform(combined_features_sparse)
+            else:
+                svd = TruncatedSVD(n_components=n_components, algorithm=svd_algorithm, n_iter=n_iter,
+                                   n_oversamples=n_oversamples, random_state=42)
+                self.reduced_features = svd.fit_transform(combined_features_sparse)
+            
+            if variance_target is not None:
+                self.reduced_features = self._truncate_components(svd, self.reduced_features, variance_target)
+            self.reduced_features = self.reduced_features.astype(dtype, copy=False)
+            self.transformers['svd'] = svd
+            stage['reduced_features'] = _describe_matrix(self.reduced_features)
+        
+        self.svd_report = {
+            'algorithm': svd_algorithm,
+            'dtype': np.dtype(dtype).name,
+            'n_components': int(self.reduced_features.shape[1]),
+            'explained_variance_ratio': float(svd.explained_variance_ratio_.sum()),
+            'seconds': time.perf_counter() - start_time,
+            'reduced_features_mb': self.reduced_features.nbytes / (1024 * 1024),
+            'peak_rss_mb': _peak_rss_mb()
+        }
+        print(f"Explained variance ratio: {svd.explained_variance_ratio_.sum():.2f}")
+        print(f"Kept {self.svd_report['n_components']} components in {self.svd_report['seconds']:.2f}s; "
+              f"reduced features use {self.svd_report['reduced_features_mb']:.1f} MB.")
+        
+        self.similarity_mode = similarity_mode
+        self._update_model_version()
+        
+        if similarity_mode == 'on_demand':
+            # Cosine similarity is the dot product of L2-normalized rows, so only
+            # the normalized features are kept and scored per query
+            print("Normalizing features for on-demand similarity...")
+            with self.profiler.stage('similarity_engine.normalize') as stage:
+                self.normalized_features = normalize(self.reduced_features)
+                stage['normalized_features'] = _describe_matrix(self.normalized_features)
+            self.cosine_sim = None
+            print("On-demand similarity ready.")
+            return self.normalized_features
+        
+        # Compute similarity matrix
+        print("Computing similarity matrix...")
+        with self.profiler.stage('similarity_engine.similarity_matrix') as stage:
+            self.cosine_sim = cosine_similarity(self.reduced_features, self.reduced_features)
+            stage['cosine_sim'] = _describe_matrix(self.cosine_sim)
+        self.normalized_features = None
+        print("Similarity matrix computed.")
+        
+        return self.cosine_sim
+    
+    @staticmethod
+    def _truncate_components(svd, reduced_features, variance_target):
+        """
+        Drop the trailing components a variance target does not need.
+        
+        The fitted estimator is trimmed in place so that transform() keeps
+        producing features of the same width.
+        
+        Parameters:
+        -----------
+        svd : TruncatedSVD or IncrementalPCA
+            The fitted estimator
+        reduced_features : numpy.ndarray
+            The features it produced
+        variance_target : float
+            Cumulative explained variance ratio to reach
+            
+        Returns:
+        --------
+        numpy.ndarray
+            The reduced features restricted to the kept components
+        """
+        cumulative = np.cumsum(svd.explained_variance_ratio_)
+        if cumulative[-1] < variance_target:
+            print(f"Variance target {variance_target:.2f} not reached with {len(cumulative)} components; "
+                  f"keeping all of them.")
+            return reduced_features
+        
+        n_components = int(np.searchsorted(cumulative, variance_target)) + 1
+        for attribute in ('components_', 'explained_variance_', 'explained_variance_ratio_', 'singular_values_'):
+            setattr(svd, attribute, getattr(svd, attribute)[:n_components])
+        svd.n_components = n_components
+        if hasattr(svd, 'n_components_'):
+            svd.n_components_ = n_components
+        
+        return np.ascontiguousarray(reduced_features[:, :n_components])
+    
+    def neighbor_table(self, k=100, block_size=512, n_jobs=-1):
+        """
+        Neighbor Table: Precomputes the k nearest neighbors of every movie.
+        
+        The normalized reduced features are processed in row blocks across a
+        joblib process pool, so peak memory and time per task are bounded by
+        block_size x N scores rather than the full N x N matrix. Neighbor
+        positions and scores are stored as compact int32/float32 arrays and
+        recommendation_service answers by slicing them.
+        
+        Parameters:
+        -----------
+        k : int, default=100
+            Number of neighbors to keep per movie
+        block_size : int, default=512
+            Number of rows scored per task
+        n_jobs : int, default=-1
+            Number of worker processes (-1 uses all cores)
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (neighbor_indices, neighbor_scores), each of shape (N, k)
+        """
+        # Ensure the reduced features are computed
+        if self.reduced_features is None:
+            print("Reduced features not found. Running similarity engine...")
+            self.similarity_engine(similarity_mode='on_demand')
+        
+        if self.normalized_features is None:
+            self.normalized_features = normalize(self.reduced_features)
+        
+        n_movies = self.normalized_features.shape[0]
+        k = min(k, n_movies - 1)
+        print(f"Computing {k} nearest neighbors for {n_movies} movies in blocks of {block_size}...")
+        
+        self.neighbor_indices = np.empty((n_movies, k), dtype=np.int32)
+        self.neighbor_scores = np.empty((n_movies, k), dtype=np.float32)
+        
+        starts = range(0, n_movies, block_size)
+        blocks = Parallel(n_jobs=n_jobs)(
+            delayed(_block_top_k)(self.normalized_features, np.arange(start, min(start + block_size, n_movies)), k,
+                                  self.removed_mask)
+            for start in starts
+        )
+        for start, (indices, scores) in zip(starts, blocks):
+            self.neighbor_indices[start:start + len(indices)] = indices
+            self.neighbor_scores[start:start + len(scores)] = scores
+        
+        # The dense matrix is no longer needed to answer queries
+        self.cosine_sim = None
+        self.similarity_mode = 'neighbors'
+        self._update_model_version()
+        print("Neighbor table computed.")
+        
+        return self.neighbor_indices, self.neighbor_scores
+    
+    def ann_index(self, backend=None, n_lists=None, n_probe=8, n_iter=10):
+        """
+        ANN Index: Builds an approximate nearest-neighbor backend for fast queries.
+        
+        The backend is built from the normalized reduced features and answers
+        recommendation_service queries in 'ann' mode. Use ann_recall() to measure
+        how closely it matches the exact engine for a given n_probe.
+        
+        Parameters:
+        -----------
+        backend : object, optional
+            An unfitted index exposing build(features) and search(query, k).
+            Defaults to an IVFIndex built with the parameters below.
+        n_lists : int, optional
+            Number of IVF partitions (defaults to 4 * sqrt(N))
+        n_probe : int, default=8
+            Number of IVF partitions scanned per query
+        n_iter : int, default=10
+            Number of k-means iterations used to train the partitions
+            
+        Returns:
+        --------
+        object
+            The fitted backend
+        """
+        # Ensure the reduced features are computed
+        if self.reduced_features is None:
+            print("Reduced features not found. Running similarity engine...")
+            self.similarity_engine(similarity_mode='on_demand')
+        
+        if self.normalized_features is None:
+            self.normalized_features = normalize(self.reduced_features)
+        
+        if backend is None:
+            backend = IVFIndex(n_lists=n_lists, n_probe=n_probe, n_iter=n_iter)
+        
+        print(f"Building {type(backend).__name__} over {self.normalized_features.shape[0]} movies...")
+        self.ann_backend = backend.build(self.normalized_features)
         self.cosine_sim = None
+        self.similarity_mode = 'ann'
+        self._update_model_version()
+        print("ANN index built.")
+        
+        return self.ann_backend
+    
+    def ann_recall(self, k=10, n_queries=200, n_probe=None, random_state=0):
+        """
+        Measure recall@k and latency of the ANN backend against exact scoring.
+        
+        Parameters:
+        -----------
+        k : int, default=10
+            Number of recommendations compared per query
+        n_queries : int, default=200
+            Number of randomly sampled query movies
+        n_probe : int or list of int, optional
+            Probe settings to evaluate. Defaults to the backend's own setting.
+        random_state : int, default=0
+            Seed for sampling the query movies
+            
+        Returns:
+        --------
+        list of dict
+            One entry per n_probe with recall_at_k and mean exact/ANN latency in milliseconds
+        """
+        if self.ann_backend is None:
+            raise ValueError("ANN index not built. Call ann_index() first.")
+        
+        rng = np.random.default_rng(random_state)
+        n_movies = self.normalized_features.shape[0]
+        queries = rng.choice(n_movies, min(n_queries, n_movies), replace=False)
+        
+        exact_results = []
+        start = time.perf_counter()
+        for idx in queries:
+            exact_results.append(self._top_k(self._similarity_scores(idx), k + 1)[1:])
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        
+        probe_settings = n_probe if isinstance(n_probe, (list, tuple)) else [n_probe]
+        report = []
+        for probe in probe_settings:
+            hits = 0
+            start = time.perf_counter()
+            for idx, exact in zip(queries, exact_results):
+                approximate, _ = self.ann_backend.search(self.normalized_features[idx], k + 1, n_probe=probe)
+                hits += len(np.intersect1d(approximate[1:], exact))
+            ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            report.append({
+                'n_probe': probe or getattr(self.ann_backend, 'n_probe', None),
+                'recall_at_k': hits / (k * len(queries)),
+                'exact_ms': exact_ms,
+                'ann_ms': ann_ms
+            })
+        
+        return report
+    
+    def hybrid_engine(self, cf_model=None, collaborative_weight=0.3, n_candidates=100):
+        """
+        Hybrid Engine: Blends content similarity with collaborative item-item similarity.
+        
+        The movie factors of a fitted CollaborativeFilteringModel are matched to
+        the catalog through their TMDB ids (see CollaborativeFilteringModel.load_links)
+        and kept L2-normalized, so the collaborative similarity of two movies is
+        the cosine of their factors. Once enabled, recommendation_service takes
+        the n_candidates best movies by content (from the current similarity
+        mode) and by collaborative similarity, and reranks their union in one
+        vectorized pass on
+        
+            (1 - collaborative_weight) * content + collaborative_weight * collaborative
+        
+        Candidates without ratings (cold-start items) are given the mean
+        collaborative similarity of the other candidates, and queries for them
+        use the content-only ranking.
+        
+        Parameters:
+        -----------
+        cf_model : CollaborativeFilteringModel, optional
+            A fitted model with TMDB links. May be omitted to only change the
+            weights of an already enabled (or loaded) hybrid engine.
+        collaborative_weight : float, default=0.3
+            Weight of the collaborative similarity, between 0 and 1. 0 switches
+            back to content-only recommendations.
+        n_candidates : int, default=100
+            Number of candidates taken from each source
+            
+        Returns:
+        --------
+        dict
+            The number of catalog movies with collaborative data and their share
+        """
+        if self.reduced_features is None:
+            raise ValueError("The model must be fitted before collaborative data can be blended in.")
+        if not 0 <= collaborative_weight <= 1:
+            raise ValueError("collaborative_weight must be between 0 and 1.")
+        
+        if cf_model is not None:
+            if cf_model.item_factors is None or cf_model.tmdb_ids is None:
+                raise ValueError("The collaborative model must be fitted and linked to TMDB ids (load_links()).")
+            self._align_collaborative(np.asarray(cf_model.tmdb_ids), normalize(np.asarray(cf_model.item_factors)))
+        elif self.collaborative_features is None:
+            raise ValueError("No collaborative features; pass a fitted CollaborativeFilteringModel.")
+        
+        self.collaborative_weight = collaborative_weight
+        self.hybrid_candidates = n_candidates
+        self._update_model_version()
+        
+        n_linked = int(self.has_collaborative.sum())
+        print(f"Hybrid engine enabled: {n_linked} of {len(self.movies_df)} movies have collaborative data.")
+        return {'linked_movies': n_linked, 'coverage': n_linked / len(self.movies_df)}
+    
+    def _align_collaborative(self, tmdb_ids, features):
+        """
+        Match collaborative feature rows to the catalog by TMDB id.
+        
+        Parameters:
+        -----------
+        tmdb_ids : numpy.ndarray
+            TMDB id of each feature row, or -1 for rows without one
+        features : numpy.ndarray
+            L2-normalized feature rows
+        """
+        linked = tmdb_ids >= 0
+        rows = pd.Series(np.flatnonzero(linked), index=tmdb_ids[linked])
+        rows = rows[~rows.index.duplicated()]
+        
+        catalog_ids = pd.to_numeric(self.movies_df['id'], errors='coerce').fillna(-1).astype(np.int64)
+        matched = rows.reindex(catalog_ids.to_numpy())
+        self.has_collaborative = matched.notna().to_numpy()
+        self.collaborative_features = np.zeros((len(self.movies_df), features.shape[1]), dtype=np.float32)
+        self.collaborative_features[self.has_collaborative] = features[matched.dropna().to_numpy(dtype=np.intp)]
+    
+    def add_movies(self, new_movies):
+        """
+        Catalog Update: Adds movies without refitting the pipeline.
+        
+        The new rows are parsed like preprocessing_pipeline() does and encoded
+        with the already-fitted transformers (genre binarizer, collection columns,
+        overview TF-IDF, numerical scaler and SVD components), so they land in the
+        existing reduced space. Genres, collections and words unseen at fit time
+        are ignored until the next refit(). The neighbor table or ANN index is
+        updated in place, so the cost grows with the number of new movies rather
+        than with the size of the catalog.
+        
+        Parameters:
+        -----------
+        new_movies : pandas.DataFrame
+            New movies with the same columns as the ingested metadata
+            
+        Returns:
+        --------
+        numpy.ndarray
+            The movie ids (row positions) assigned to the new movies
+        """
+        if self.reduced_features is None or 'svd' not in self.transformers:
+            raise ValueError("The model must be fitted before movies can be added.")
+        if self.similarity_mode == 'dense':
+            raise ValueError("add_movies() does not update the dense similarity matrix. "
+                             "Use similarity_mode='on_demand', neighbor_table() or ann_index(), or call refit().")
+        if self.similarity_mode == 'ann' and not hasattr(self.ann_backend, 'add'):
+            raise ValueError(f"{type(self.ann_backend).__name__} does not support adding movies; call refit().")
+        
+        print(f"Adding {len(new_movies)} movies...")
+        new_movies = new_movies.reset_index(drop=True).copy()
+        start = len(self.movies_df)
+        positions = np.arange(start, start + len(new_movies))
+        
+        # Parse the nested fields exactly as preprocessing_pipeline() does
+        new_movies['genres'] = _parse_column(new_movies['genres'], _parse_genres)
+        new_movies['genre_names'] = new_movies['genres'].apply(lambda x: [genre['name'] for genre in x])
+        new_movies['collection_name'] = _parse_column(new_movies['belongs_to_collection'], _parse_collection_name)
+        new_movies['overview'] = new_movies['overview'].fillna("")
+        new_movies['genre_features'] = new_movies['genre_names'].apply(' '.join)
+        
+        # Encode with the fitted transformers
+        mlb = self.transformers['genre_binarizer']
+        known_genres = set(mlb.classes_)
+        genres_sparse = mlb.transform(
+            new_movies['genre_names'].apply(lambda genres: [genre for genre in genres if genre in known_genres])
+        ).tocsr()
+        
+        collection_columns = pd.Index(self.transformers['collection_columns'])
+        collection_sparse = _one_hot(
+            collection_columns.get_indexer(new_movies['collection_name']), len(collection_columns), weight=2
+        )
+        
+        tfidf_matrix = self.transformers['overview_tfidf'].transform(new_movies['overview'])
+        
+        numerical_df = new_movies[['budget', 'revenue', 'runtime']].apply(pd.to_numeric, errors='coerce')
+        numerical_df = numerical_df.replace(0, self.transformers['numerical_zero_fill'])
+        numerical_df = numerical_df.fillna(self.transformers['numerical_nan_fill'])
+        normalized_numerical_df = pd.DataFrame(
+            self.transformers['numerical_scaler'].transform(numerical_df),
+            columns=numerical_df.columns
+        )
+        numerical_sparse = csr_matrix(normalized_numerical_df.values)
+        
+        genre_tfidf_matrix = self.transformers['genre_tfidf'].transform(new_movies['genre_features'])
+        
+        # Project into the existing reduced space
+        reduced_features = self.transformers['svd'].transform(
+            hstack([genres_sparse, tfidf_matrix, numerical_sparse, collection_sparse]).tocsr()
+        ).astype(self.reduced_features.dtype, copy=False)
+        normalized_features = normalize(reduced_features)
+        
+        # Append to the stored features (this also copies memory-mapped arrays into memory)
+        self.reduced_features = np.vstack([self.reduced_features, reduced_features])
+        if self.normalized_features is not None:
+            self.normalized_features = np.vstack([self.normalized_features, normalized_features])
+        if self.embedding_store is not None:
+            self.embedding_store.append(normalized_features)
+        for name, matrix in [('genres_sparse', genres_sparse), ('tfidf_matrix', tfidf_matrix),
+                             ('numerical_sparse', numerical_sparse), ('collection_sparse', collection_sparse),
+                             ('genre_tfidf_matrix', genre_tfidf_matrix)]:
+            if getattr(self, name) is not None:
+                setattr(self, name, vstack([getattr(self, name), matrix]).tocsr())
+        
+        new_movies = pd.concat([new_movies, normalized_numerical_df.add_suffix('_normalized')], axis=1)
+        self.movies_df = pd.concat(
+            [self.movies_df, new_movies.reindex(columns=self.movies_df.columns)], ignore_index=True
+        )
+        if self.removed_mask is not None:
+            self.removed_mask = np.concatenate([self.removed_mask, np.zeros(len(positions), dtype=bool)])
+        if self.collaborative_features is not None:
+            # New movies have no ratings yet, so the hybrid engine ranks them on content
+            self.has_collaborative = np.concatenate([self.has_collaborative, np.zeros(len(positions), dtype=bool)])
+            self.collaborative_features = np.concatenate([
+                self.collaborative_features,
+                np.zeros((len(positions), self.collaborative_features.shape[1]), dtype=np.float32)
+            ])
+        
+        for position, title in zip(positions, new_movies['title']):
+            if isinstance(title, str):
+                key = title.lower()
+                self.title_index[key] = np.append(self.title_index.get(key, np.empty(0, dtype=np.intp)), position)
+        self.title_search = None
+        self.filter_index = None
+        
+        if self.neighbor_indices is not None:
+            self._add_to_neighbor_table(positions)
+        if self.ann_backend is not None:
+            self.ann_backend.add(positions, normalized_features)
+        
+        self._update_model_version()
+        print(f"Catalog now has {len(self.movies_df)} movies.")
+        return positions
+    
+    def _add_to_neighbor_table(self, positions, block_size=4096):
+        """
+        Extend the neighbor table with rows for new movies and merge the new
+        movies into the neighbor lists of existing movies they now outrank.
         
-    def data_ingestion(self, filepath):
+        Parameters:
+        -----------
+        positions : numpy.ndarray
+            Row positions of the new movies, which follow all existing rows
+        block_size : int, default=4096
+            Number of existing rows scored against the new movies at once
         """
-        Data Ingestion Module: Handles reading and initial parsing of the movie metadata CSV.
+        k = self.neighbor_indices.shape[1]
+        new_indices, new_scores = _block_top_k(self.normalized_features, positions, k, self.removed_mask)
+        
+        neighbor_indices = np.vstack([self.neighbor_indices, new_indices])
+        neighbor_scores = np.vstack([self.neighbor_scores, new_scores])
+        
+        new_features = self.normalized_features[positions]
+        for start in range(0, positions[0], block_size):
+            rows = np.arange(start, min(start + block_size, positions[0]))
+            scores = (self.normalized_features[rows] @ new_features.T).astype(np.float32)
+            if self.removed_mask is not None:
+                scores[self.removed_mask[rows]] = -np.inf
+            
+            # New movies have the highest positions, so they only enter a list by
+            # scoring strictly above its current k-th neighbor
+            affected = np.flatnonzero((scores > neighbor_scores[rows, -1:]).any(axis=1))
+            if not len(affected):
+                continue
+            
+            candidate_indices = np.hstack([
+                neighbor_indices[rows[affected]], np.broadcast_to(positions, (len(affected), len(positions)))
+            ])
+            candidate_scores = np.hstack([neighbor_scores[rows[affected]], scores[affected]])
+            order = np.lexsort((candidate_indices, -candidate_scores), axis=-1)[:, :k]
+            neighbor_indices[rows[affected]] = np.take_along_axis(candidate_indices, order, axis=1)
+            neighbor_scores[rows[affected]] = np.take_along_axis(candidate_scores, order, axis=1)
+        
+        self.neighbor_indices = neighbor_indices
+        self.neighbor_scores = neighbor_scores
+    
+    def remove_movies(self, movie_ids):
+        """
+        Catalog Update: Removes movies without refitting the pipeline.
+        
+        Removed movies keep their row positions (so other movie ids stay valid)
+        but are masked out of title lookups, search and every ranking. Only the
+        neighbor lists that contained a removed movie are recomputed. refit()
+        drops them for good.
         
         Parameters:
         -----------
-        filepath : str
-            Path to the movie metadata CSV file
+        movie_ids : list of int
+            Movie ids (row positions) to remove
             
         Returns:
         --------
-        pandas.DataFrame
-            The loaded movies dataframe
+        int
+            The number of neighbor lists that were recomputed
         """
-        print("Loading movie data...")
-        self.movies_df = pd.read_csv(filepath, low_memory=False)
-        print(f"Loaded {len(self.movies_df)} movies.")
-        return self.movies_df
+        movie_ids = np.unique(np.asarray(movie_ids, dtype=np.intp))
+        print(f"Removing {len(movie_ids)} movies...")
+        
+        if self.removed_mask is None:
+            self.removed_mask = np.zeros(len(self.movies_df), dtype=bool)
+        else:
+            self.removed_mask = np.array(self.removed_mask)
+        self.removed_mask[movie_ids] = True
+        
+        for position, title in zip(movie_ids, self.movies_df['title'].iloc[movie_ids]):
+            key = title.lower() if isinstance(title, str) else None
+            if key in self.title_index:
+                remaining = self.title_index[key][self.title_index[key] != position]
+                if len(remaining):
+                    self.title_index[key] = remaining
+                else:
+                    del self.title_index[key]
+        
+        recomputed = 0
+        if self.neighbor_indices is not None:
+            self.neighbor_indices = np.array(self.neighbor_indices)
+            self.neighbor_scores = np.array(self.neighbor_scores)
+            rows = np.flatnonzero(np.isin(self.neighbor_indices, movie_ids).any(axis=1) & ~self.removed_mask)
+            if len(rows):
+                k = self.neighbor_indices.shape[1]
+                indices, scores = _block_top_k(self.normalized_features, rows, k, self.removed_mask)
+                self.neighbor_indices[rows] = indices
+                self.neighbor_scores[rows] = scores
+            recomputed = len(rows)
+        
+        if self.ann_backend is not None and hasattr(self.ann_backend, 'remove'):
+            self.ann_backend.remove(movie_ids)
+        
+        self._update_model_version()
+        print(f"Removed {len(movie_ids)} movies; recomputed {recomputed} neighbor lists.")
+        return recomputed
     
-    def preprocessing_pipeline(self):
+    def refit(self, source_df=None, n_components=None):
         """
-        Preprocessing Pipeline: Manages data cleaning, type conversion, and feature extraction.
+        Catalog Update: Rebuilds the whole model from the current catalog.
         
-        This method handles:
-        - Genre extraction and encoding
-        - Collection information extraction
-        - Text processing for movie overviews
-        - Numerical feature normalization
+        Meant to run on a schedule (e.g. nightly) after incremental updates:
+        it refits every transformer and the SVD on the movies that are still
+        active, so new genres, collections and vocabulary are picked up and
+        removed movies are dropped. The similarity mode (including the neighbor
+        table size or IVF settings) is preserved. Movie ids are renumbered.
         
+        Parameters:
+        -----------
+        source_df : pandas.DataFrame, optional
+            The raw catalog to fit on. Defaults to the source columns of the
+            active movies, which are only available for models built in-process
+            (a loaded artifact keeps the display columns only).
+        n_components : int, optional
+            Number of SVD components. Defaults to the current number.
+            
         Returns:
         --------
-        tuple
-            A tuple containing the processed features: (genres_sparse, tfidf_matrix, numerical_sparse, collection_sparse)
+        numpy.ndarray
+            The new movie id of every previous movie id, or -1 for removed movies
+            (None when source_df is given)
         """
-        print("Starting preprocessing pipeline...")
-        
-        # 1. Process Genres
-        print("Processing genres...")
-        # Convert genres from string to list of dictionaries
-        self.movies_df['genres'] = self.movies_df['genres'].apply(
-            lambda x: ast.literal_eval(x) if isinstance(x, str) else []
-        )
-        
-        # Extract genre names
-        self.movies_df['genre_names'] = self.movies_df['genres'].apply(
-            lambda x: [genre['name'] for genre in x]
-        )
-        
-        # Create binary genre features
-        mlb = MultiLabelBinarizer()
-        genres_matrix = mlb.fit_transform(self.movies_df['genre_names'])
-        genres_df = pd.DataFrame(genres_matrix, columns=mlb.classes_)
+        mode = self.similarity_mode
+        n_components = n_components or self.reduced_features.shape[1]
+        dtype = self.reduced_features.dtype.name
+        k = None if self.neighbor_indices is None else self.neighbor_indices.shape[1]
+        backend = self.ann_backend
+        store = self.embedding_store
+        
+        id_map = None
+        if source_df is None:
+            if not self.source_columns or any(column not in self.movies_df.columns for column in self.source_columns):
+                raise ValueError("The source columns are not available; pass source_df to refit().")
+            active = np.ones(len(self.movies_df), dtype=bool) if self.removed_mask is None else ~self.removed_mask
+            source_df = self.movies_df.loc[active, self.source_columns].copy()
+            # Genres were parsed in place, so restore their original string form
+            source_df['genres'] = source_df['genres'].apply(lambda x: repr(x) if isinstance(x, list) else x)
+            id_map = np.full(len(self.movies_df), -1, dtype=np.intp)
+            id_map[active] = np.arange(active.sum())
+        
+        # Collaborative features follow their movies through the TMDB ids
+        collaborative = None
+        if self.collaborative_features is not None:
+            catalog_ids = pd.to_numeric(self.movies_df['id'], errors='coerce').fillna(-1).astype(np.int64).to_numpy()
+            collaborative = (np.where(self.has_collaborative, catalog_ids, -1), np.asarray(self.collaborative_features))
+        
+        print(f"Refitting the model on {len(source_df)} movies...")
+        self.movies_df = source_df.reset_index(drop=True)
+        self.source_columns = list(self.movies_df.columns)
+        self.transformers = {}
+        self.removed_mask = None
+        self.neighbor_indices = None
+        self.neighbor_scores = None
+        self.ann_backend = None
+        self.embedding_store = None
+        self.title_search = None
+        self.filter_index = None
+        
+        self.preprocessing_pipeline()
+        self.similarity_engine(n_components=n_components, dtype=dtype,
+                               similarity_mode='dense' if mode == 'dense' else 'on_demand')
+        if mode == 'neighbors':
+            self.neighbor_table(k=k)
+        elif mode == 'ann':
+            if isinstance(backend, IVFIndex):
+                self.ann_index(n_probe=backend.n_probe, n_iter=backend.n_iter)
+            else:
+                self.ann_index(backend=type(backend)())
+        if store is not None:
+            self.quantize_embeddings(store.precision, rerank_candidates=self.rerank_candidates)
+        if collaborative is not None:
+            self._align_collaborative(*collaborative)
         
-        # Convert to sparse matrix for efficiency
-        self.genres_sparse = csr_matrix(genres_df.values)
+        return id_map
+    
+    def quantize_embeddings(self, precision='int8', rerank_candidates=100, top_n=10, n_queries=200,
+                            random_state=0):
+        """
+        Embedding Store: Keeps the normalized embeddings in reduced precision.
         
-        # 2. Process Collection Information
-        print("Processing collection information...")
-        # Extract collection names
-        def extract_collection_name(x):
-            if pd.isna(x) or x == "" or x == "NaN":
-                return ""
-            try:
-                data = ast.literal_eval(x)
-                return data.get("name", "")
-            except Exception:
-                return ""
+        The float64 normalized features (and the dense similarity matrix, if any)
+        are replaced by an EmbeddingStore that queries are scored against. When
+        rerank_candidates is positive, that many top candidates are rescored from
+        the full-precision reduced features, which are only read row by row (and
+        stay on disk when the model is loaded with mmap=True). Memory, latency
+        and top-N overlap against the float64 path are measured on sampled
+        queries before the float64 features are dropped, and returned.
         
-        # Apply the function to extract collection names
-        self.movies_df['collection_name'] = self.movies_df['belongs_to_collection'].apply(extract_collection_name)
+        Parameters:
+        -----------
+        precision : {'float32', 'float16', 'int8'}, default='int8'
+            Storage precision of the embeddings
+        rerank_candidates : int, default=100
+            Number of candidates rescored in full precision (0 disables reranking)
+        top_n : int, default=10
+            Number of recommendations compared per query in the report
+        n_queries : int, default=200
+            Number of randomly sampled query movies in the report
+        random_state : int, default=0
+            Seed for sampling the query movies
+            
+        Returns:
+        --------
+        dict
+            The report, also stored in embedding_report
+        """
+        if self.reduced_features is None:
+            raise ValueError("The model must be fitted before its embeddings can be quantized.")
+        if self.similarity_mode not in ('dense', 'on_demand'):
+            raise ValueError("Quantized embeddings replace exact scoring; "
+                             "they cannot be combined with the neighbor table or an ANN index.")
+        
+        print(f"Quantizing embeddings to {precision}...")
+        if self.normalized_features is None:
+            self.normalized_features = normalize(self.reduced_features)
+        self.embedding_store = None
+        self.cosine_sim = None
+        self.similarity_mode = 'on_demand'
+        
+        rng = np.random.default_rng(random_state)
+        n_movies = self.normalized_features.shape[0]
+        queries = rng.choice(n_movies, min(n_queries, n_movies), replace=False)
+        
+        exact_results = []
+        start = time.perf_counter()
+        for idx in queries:
+            exact_results.append(self._rank_similar(idx, top_n)[0])
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        
+        store = EmbeddingStore(precision).build(self.normalized_features)
+        float64_mb = self.normalized_features.nbytes / (1024 * 1024)
+        self.embedding_store = store
+        self.rerank_candidates = rerank_candidates
+        self.normalized_features = None
+        
+        hits = 0
+        start = time.perf_counter()
+        for idx, exact in zip(queries, exact_results):
+            hits += len(np.intersect1d(self._rank_similar(idx, top_n)[0], exact))
+        quantized_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        
+        self.embedding_report = {
+            'precision': precision,
+            'rerank_candidates': rerank_candidates,
+            'store_mb': store.nbytes / (1024 * 1024),
+            'float64_mb': float64_mb,
+            'exact_ms': exact_ms,
+            'quantized_ms': quantized_ms,
+            f'overlap_at_{top_n}': hits / (top_n * len(queries))
+        }
+        print(f"Embedding store uses {self.embedding_report['store_mb']:.1f} MB "
+              f"(float64: {float64_mb:.1f} MB); top-{top_n} overlap "
+              f"{self.embedding_report[f'overlap_at_{top_n}']:.3f}; "
+              f"{quantized_ms:.2f} ms vs {exact_ms:.2f} ms per query.")
+        self._update_model_version()
+        return self.embedding_report
+    
+    def _similarity_scores(self, idx):
+        """
+        Return the cosine similarity of every movie to the movie at position idx.
         
-        # Create dummy variables for collection names
-        collection_dummies = pd.get_dummies(self.movies_df['collection_name'], prefix='collection')
+        Parameters:
+        -----------
+        idx : int
+            Row position of the query movie
+            
+        Returns:
+        --------
+        numpy.ndarray
+            A 1-D array of similarity scores, one per movie
+        """
+        if self.embedding_store is not None:
+            scores = self.embedding_store.score(self.embedding_store.vector(idx))
+        elif self.normalized_features is not None:
+            scores = self.normalized_features @ self.normalized_features[idx]
+        else:
+            scores = self.cosine_sim[idx]
+        
+        # Removed movies can never be recommended
+        if self.removed_mask is not None:
+            scores = np.where(self.removed_mask, -np.inf, scores)
+        return scores
+    
+    def _rank_similar(self, idx, top_n, allowed=None, content_only=False):
+        """
+        Return the top_n movies most similar to the movie at position idx.
         
-        # Convert to sparse matrix and apply weighting (collections are important signals)
-        self.collection_sparse = csr_matrix(collection_dummies.values) * 2  # Applying weight multiplier
+        The first-ranked movie (the query itself) is excluded. In 'neighbors'
+        mode the answer is a slice of the precomputed table; requests for more
+        than k neighbors fall back to exact scoring. In 'ann' mode the answer
+        comes from the approximate backend.
         
-        # 3. Process Textual Features (Overview)
-        print("Processing textual features...")
-        # Fill NaN values in 'overview' column with an empty string
-        self.movies_df['overview'] = self.movies_df['overview'].fillna("")
+        Parameters:
+        -----------
+        idx : int
+            Row position of the query movie
+        top_n : int
+            Number of movies to return
+        allowed : numpy.ndarray, optional
+            Boolean mask of the movies that may be returned (see _rank_filtered)
+        content_only : bool, default=False
+            If True, ignore the hybrid engine and rank on content similarity
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (movie_positions, similarity_scores)
+        """
+        if self.collaborative_weight and not content_only and self.has_collaborative[idx]:
+            return self._rank_hybrid(idx, top_n, allowed)
+        
+        if allowed is not None:
+            return self._rank_filtered(idx, top_n, allowed)
+        
+        if self.similarity_mode == 'neighbors' and top_n <= self.neighbor_indices.shape[1]:
+            return self.neighbor_indices[idx, :top_n], self.neighbor_scores[idx, :top_n]
+        
+        if self.similarity_mode == 'ann':
+            movie_indices, sim_scores = self.ann_backend.search(self.normalized_features[idx], top_n + 1)
+            return movie_indices[1:], sim_scores[1:]
+        
+        sim_scores = self._similarity_scores(idx)
+        
+        if self.embedding_store is not None and self.rerank_candidates:
+            # Rescore the best quantized candidates in full precision. Candidates are
+            # kept in position order so ties are still broken by ascending position.
+            candidates = np.sort(self._top_k(sim_scores, max(self.rerank_candidates, top_n + 1)))
+            candidate_features = normalize(self.reduced_features[candidates])
+            exact_scores = candidate_features @ normalize(self.reduced_features[idx:idx + 1])[0]
+            if self.removed_mask is not None:
+                exact_scores[self.removed_mask[candidates]] = -np.inf
+            order = self._top_k(exact_scores, top_n + 1)[1:]
+            return candidates[order], exact_scores[order]
+        
+        movie_indices = self._top_k(sim_scores, top_n + 1)[1:]
+        return movie_indices, sim_scores[movie_indices]
+    
+    def _rank_hybrid(self, idx, top_n, allowed=None):
+        """
+        Return the top_n movies for idx by blended content and collaborative similarity.
         
-        # Initialize TF-IDF vectorizer and transform overviews
-        tfidf = TfidfVectorizer(stop_words='english')
-        self.tfidf_matrix = tfidf.fit_transform(self.movies_df['overview'])
+        Candidates are the best movies by content similarity (from the current
+        similarity mode, filters included) and by collaborative similarity (one
+        product with the collaborative features). Their union is rescored on
+        both signals at once and ranked on the blend (see hybrid_engine).
         
-        # 4. Process Numerical Features
-        print("Processing numerical features...")
-        # Select numerical features
-        numerical_features = ['budget', 'revenue', 'runtime']
-        numerical_df = self.movies_df[numerical_features].apply(pd.to_numeric, errors='coerce')
+        Parameters:
+        -----------
+        idx : int
+            Row position of the query movie, which must have collaborative data
+        top_n : int
+            Number of movies to return
+        allowed : numpy.ndarray, optional
+            Boolean mask of the movies that may be returned
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (movie_positions, blended_scores)
+        """
+        n_candidates = max(self.hybrid_candidates, top_n)
+        content_candidates, _ = self._rank_similar(idx, n_candidates, allowed, content_only=True)
+        
+        collaborative_scores = self.collaborative_features @ self.collaborative_features[idx]
+        excluded = ~self.has_collaborative
+        excluded[idx] = True
+        if self.removed_mask is not None:
+            excluded |= self.removed_mask
+        if allowed is not None:
+            excluded |= ~allowed
+        collaborative_scores[excluded] = -np.inf
+        collaborative_candidates = self._top_k(collaborative_scores, n_candidates)
+        collaborative_candidates = collaborative_candidates[np.isfinite(collaborative_scores[collaborative_candidates])]
+        
+        # Rescore the union in position order, so ties are still broken by ascending position
+        candidates = np.union1d(content_candidates, collaborative_candidates)
+        candidates = candidates[candidates != idx]
+        content_scores = normalize(self.reduced_features[candidates]) @ normalize(self.reduced_features[idx:idx + 1])[0]
+        candidate_scores = self.collaborative_features[candidates] @ self.collaborative_features[idx]
+        
+        # Candidates without ratings get the mean collaborative similarity of the
+        # others, so the blend neither favors nor penalizes cold-start movies
+        linked = self.has_collaborative[candidates]
+        candidate_scores[~linked] = candidate_scores[linked].mean() if linked.any() else 0
+        blended_scores = (1 - self.collaborative_weight) * content_scores + self.collaborative_weight * candidate_scores
+        
+        order = self._top_k(blended_scores, top_n)
+        return candidates[order], blended_scores[order]
+    
+    def _rank_filtered(self, idx, top_n, allowed):
+        """
+        Return the top_n movies most similar to idx among the allowed movies.
         
-        # Replace 0s with the median to avoid zero-impact
-        numerical_df = numerical_df.replace(0, numerical_df.median())
+        The filter is applied inside the ranking. A selective filter (passing
+        at most FILTER_SUBSET_FRACTION of the catalog) is scored on the passing
+        movies only; otherwise the catalog is scored as usual and the other
+        movies are masked out before the top-k selection. The neighbor table
+        and the ANN index are used when their candidates hold enough passing
+        movies, with exact scoring as the fallback.
         
-        # Fill any remaining NaN values with the median
-        numerical_df = numerical_df.fillna(numerical_df.median())
+        Parameters:
+        -----------
+        idx : int
+            Row position of the query movie, which is never returned
+        top_n : int
+            Number of movies to return
+        allowed : numpy.ndarray
+            Boolean mask of the movies that may be returned
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (movie_positions, similarity_scores); fewer than
+            top_n movies are returned only if fewer pass the filter
+        """
+        allowed = allowed.copy() if self.removed_mask is None else allowed & ~self.removed_mask
+        allowed[idx] = False
+        n_allowed = int(allowed.sum())
+        subset = n_allowed <= self.FILTER_SUBSET_FRACTION * len(allowed)
+        
+        if self.similarity_mode == 'neighbors':
+            keep = allowed[self.neighbor_indices[idx]]
+            if keep.sum() >= min(top_n, n_allowed):
+                return self.neighbor_indices[idx][keep][:top_n], self.neighbor_scores[idx][keep][:top_n]
+        
+        if self.similarity_mode == 'ann' and not subset:
+            # Oversample the approximate search so that enough results pass the filter
+            k = min(len(allowed), int(np.ceil(2 * (top_n + 1) * len(allowed) / n_allowed)))
+            movie_indices, sim_scores = self.ann_backend.search(self.normalized_features[idx], k)
+            keep = allowed[movie_indices]
+            if keep.sum() >= top_n:
+                return movie_indices[keep][:top_n], sim_scores[keep][:top_n]
+        
+        if subset:
+            rows = np.flatnonzero(allowed)
+            if self.embedding_store is not None:
+                sim_scores = self.embedding_store.score(self.embedding_store.vector(idx), rows)
+            elif self.normalized_features is not None:
+                sim_scores = self.normalized_features[rows] @ self.normalized_features[idx]
+            else:
+                sim_scores = np.asarray(self.cosine_sim[idx, rows])
+        else:
+            rows = np.arange(len(allowed))
+            sim_scores = np.where(allowed, self._similarity_scores(idx), -np.inf)
+        
+        if self.embedding_store is not None and self.rerank_candidates and len(rows):
+            # Rescore the best quantized candidates in full precision, in position order
+            candidates = rows[np.sort(self._top_k(sim_scores, max(self.rerank_candidates, top_n)))]
+            rows, sim_scores = candidates, normalize(self.reduced_features[candidates]) @ normalize(
+                self.reduced_features[idx:idx + 1]
+            )[0]
+            sim_scores[~allowed[candidates]] = -np.inf
+        
+        order = self._top_k(sim_scores, top_n)
+        order = order[np.isfinite(sim_scores[order])]
+        return rows[order], sim_scores[order]
+    
+    def _compile_filters(self, filters):
+        """
+        Compile recommendation filters with the filter index.
         
-        # Normalize numerical features
-        scaler = StandardScaler()
-        normalized_numerical_df = pd.DataFrame(
-            scaler.fit_transform(numerical_df),
-            columns=numerical_df.columns
-        )
+        Parameters:
+        -----------
+        filters : dict or None
+            Filters as described in FilterIndex
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (filter_key, allowed_mask), both None when nothing is filtered
+        """
+        if self.filter_index is None:
+            self.filter_index = FilterIndex(self.movies_df)
+        key = self.filter_index.compile(filters)
+        return key, None if key is None else self.filter_index.mask(key)
+    
+    def _cached_rank_similar(self, idx, top_n, filters=None):
+        """
+        Return _rank_similar(idx, top_n) through the result cache.
         
-        # Convert to sparse matrix
-        self.numerical_sparse = csr_matrix(normalized_numerical_df.values)
+        Entries are keyed on (idx, top_n, model_version) and the compiled
+        filters, so results of an older model are never served. Set
+        result_cache to None to disable caching.
         
-        # Store the processed features in the dataframe
-        self.movies_df = pd.concat([self.movies_df, genres_df, normalized_numerical_df], axis=1)
+        Parameters:
+        -----------
+        idx : int
+            Row position of the query movie
+        top_n : int
+            Number of movies to return
+        filters : dict, optional
+            Filters on the recommended movies (see FilterIndex)
+            
+        Returns:
+        --------
+        tuple
+            A tuple containing (movie_positions, similarity_scores) as read-only arrays
+        """
+        filter_key, allowed = self._compile_filters(filters)
+        if self.result_cache is None:
+            return self._rank_similar(idx, top_n, allowed)
+        
+        key = (int(idx), int(top_n), self.model_version)
+        if filter_key is not None:
+            key += (filter_key,)
+        result = self.result_cache.get(key)
+        if result is None:
+            movie_indices, sim_scores = self._rank_similar(idx, top_n, allowed)
+            result = (np.array(movie_indices, dtype=np.int64), np.array(sim_scores, dtype=np.float64))
+            for array in result:
+                array.setflags(write=False)
+            self.result_cache.put(key, result)
+        return result
+    
+    def _recommendation_frame(self, movie_indices, sim_scores):
+        """
+        Build the recommendations dataframe returned by recommendation_service.
         
-        # Create genre_features field for evaluation
-        self.movies_df['genre_features'] = self.movies_df['genre_names'].apply(
-            lambda genres: ' '.join(genres) if isinstance(genres, list) else ''
-        )
+        Only the displayed columns of the recommended rows are copied.
         
-        print("Preprocessing complete.")
-        return (self.genres_sparse, self.tfidf_matrix, self.numerical_sparse, self.collection_sparse)
+        Parameters:
+        -----------
+        movie_indices : numpy.ndarray
+            Row positions of the recommended movies
+        sim_scores : numpy.ndarray
+            Their similarity scores
+            
+        Returns:
+        --------
+        pandas.DataFrame
+            The recommended movies with their similarity scores
+        """
+        columns = ['title', 'genre_names', 'vote_average', 'release_date', 'overview']
+        recommendations = self.movies_df.iloc[movie_indices, self.movies_df.columns.get_indexer(columns)]
+        recommendations.insert(4, 'similarity_score', sim_scores)
+        return recommendations
     
-    def similarity_engine(self, n_components=2000):
+    @staticmethod
+    def _top_k(scores, k):
         """
-        Similarity Engine: Computes and manages the similarity matrix.
+        Return the positions of the k highest scores in descending order.
         
-        This method combines all features, performs dimensionality reduction, 
-        and calculates the similarity matrix.
+        Ties are broken by ascending position, which is the order a stable
+        descending sort over all scores produces. Only the candidates selected
+        by argpartition are sorted, so the cost is linear in len(scores).
         
         Parameters:
         -----------
-        n_components : int, default=2000
-            Number of components to keep in dimensionality reduction
+        scores : numpy.ndarray
+            1-D array of scores
+        k : int
+            Number of positions to return
             
         Returns:
         --------
         numpy.ndarray
-            The computed cosine similarity matrix
+            The positions of the top k scores
         """
-        print("Building similarity engine...")
-        
-        # Ensure features are processed
-        if any(x is None for x in [self.genres_sparse, self.tfidf_matrix, 
-                                 self.numerical_sparse, self.collection_sparse]):
-            print("Features not processed. Running preprocessing pipeline...")
-            self.preprocessing_pipeline()
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
         
-        # Combine all features
-        print("Combining features...")
-        combined_features_sparse = hstack([
-            self.genres_sparse, 
-            self.tfidf_matrix,
-            self.numerical_sparse, 
-            self.collection_sparse
-        ])
-        
-        # Dimensionality reduction
-        print(f"Performing dimensionality reduction to {n_components} components...")
-        svd = TruncatedSVD(n_components=n_components, random_state=42)
-        self.reduced_features = svd.fit_transform(combined_features_sparse)
-        print(f"Explained variance ratio: {svd.explained_variance_ratio_.sum():.2f}")
-        
-        # Compute similarity matrix
-        print("Computing similarity matrix...")
-        self.cosine_sim = cosine_similarity(self.reduced_features, self.reduced_features)
-        print("Similarity matrix computed.")
+        candidates = np.argpartition(-scores, k - 1)[:k]
         
-        return self.cosine_sim
+        # Pull in every score tied with the k-th one so tie-breaking is deterministic
+        candidates = np.flatnonzero(scores >= scores[candidates].min())
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order[:k]]
     
-    def recommendation_service(self, title, top_n=5):
+    @_profiled('recommendation_service')
+    def recommendation_service(self, title, top_n=5, filters=None):
         """
         Recommendation Service: Provides the interface for retrieving and rendering recommendations.
         
@@ -210,6 +2813,9 @@ class MovieRecommendationSystem:
             The title of the movie to get recommendations for
         top_n : int, default=5
             Number of recommendations to return
+        filters : dict, optional
+            Filters on the recommended movies, e.g. {'genres': ['Drama'], 'min_year': 2000,
+            'min_rating': 7} (see FilterIndex)
             
         Returns:
         --------
@@ -217,132 +2823,652 @@ class MovieRecommendationSystem:
             A tuple containing (input_movie_index, recommendations_dataframe)
         """
         # Ensure similarity matrix is computed
-        if self.cosine_sim is None:
+        if self.cosine_sim is None and self.normalized_features is None and self.embedding_store is None:
             print("Similarity matrix not found. Computing...")
             self.similarity_engine()
         
         title = title.lower()
         
-        # Find the index of the movie that matches the title
-        indices = pd.Series(self.movies_df.index, index=self.movies_df['title'].str.lower())
+        # Find the positions of the movies that match the title
+        if self.title_index is None:
+            self._build_title_index()
+        matches = self.title_index.get(title)
         
         # Handle titles not found exactly
-        if title not in indices:
-            closest_titles = self.movies_df[self.movies_df['title'].str.contains(title, case=False, na=False)]
+        if matches is None:
+            closest_titles = self.search_titles(title, limit=1)
             if len(closest_titles) > 0:
-                title = closest_titles.iloc[0]['title'].lower()
-                print(f"Title not found exactly. Using closest match: '{closest_titles.iloc[0]['title']}'")
+                title = closest_titles[0]['title'].lower()
+                print(f"Title not found exactly. Using closest match: '{closest_titles[0]['title']}'")
+                matches = self.title_index[title]
             else:
                 print(f"No title containing '{title}' found.")
                 return None, pd.DataFrame()
         
-        idx = indices[title]
+        idx = matches[0]
         
         # Handle multiple movies with the same title
-        if isinstance(idx, pd.Series):
+        if len(matches) > 1:
             print(f"Multiple movies found for '{title}':")
-            for i, index in enumerate(idx):
-                movie_info = self.movies_df.loc[index, ['title', 'release_date']]
+            for i, index in enumerate(matches):
+                movie_info = self.movies_df.iloc[index][['title', 'release_date']]
                 print(f"{i+1}. {movie_info['title']} ({movie_info['release_date']})")
             
             choice = int(input("Enter the number of the movie you meant: ")) - 1
-            idx = idx.iloc[choice]
+            idx = matches[choice]
+        
+        # Get the top N most similar movies (excluding the input movie), reusing cached rankings
+        movie_indices, sim_scores = self._cached_rank_similar(idx, top_n, filters)
+        
+        # Return recommended movies with relevant information and their similarity scores
+        return idx, self._recommendation_frame(movie_indices, sim_scores)
+    
+    def recommend_many(self, seeds, top_n=5, block_size=256):
+        """
+        Multi-Query Service: Provides recommendations for many movies in one call.
+        
+        Seeds are resolved to catalog positions and the ones not in the result
+        cache are scored together: in 'on_demand' mode with one matrix-matrix
+        product per block of seeds instead of one matrix-vector product each.
+        The rankings are the same as recommendation_service() returns.
+        
+        Parameters:
+        -----------
+        seeds : list of int or str
+            Movie ids (row positions) or exact titles. A title shared by several
+            movies resolves to the first one in catalog order.
+        top_n : int, default=5
+            Number of recommendations per seed
+        block_size : int, default=256
+            Number of seeds scored per matrix product
+            
+        Returns:
+        --------
+        list of dict
+            One entry per seed, in order, with the seed, its movie_id and title and
+            a recommendations dataframe, or with an 'error' for unknown seeds
+        """
+        if self.cosine_sim is None and self.normalized_features is None and self.embedding_store is None:
+            print("Similarity matrix not found. Computing...")
+            self.similarity_engine()
+        if self.title_index is None:
+            self._build_title_index()
+        
+        # Resolve every seed to a catalog position
+        positions = []
+        for seed in seeds:
+            if isinstance(seed, str):
+                matches = self.title_index.get(seed.lower())
+                positions.append(None if matches is None else int(matches[0]))
+            elif 0 <= int(seed) < len(self.movies_df) and not (
+                    self.removed_mask is not None and self.removed_mask[int(seed)]):
+                positions.append(int(seed))
+            else:
+                positions.append(None)
+        
+        # Score the distinct seeds that are not cached
+        rankings = {}
+        for idx in dict.fromkeys(position for position in positions if position is not None):
+            key = (idx, int(top_n), self.model_version)
+            cached = self.result_cache.get(key) if self.result_cache is not None else None
+            if cached is not None:
+                rankings[idx] = cached
+        uncached = np.array([idx for idx in dict.fromkeys(positions) if idx is not None and idx not in rankings])
+        
+        use_matrix_product = (
+            self.normalized_features is not None and self.embedding_store is None
+            and self.similarity_mode != 'ann' and not self.collaborative_weight
+            and not (self.similarity_mode == 'neighbors' and top_n <= self.neighbor_indices.shape[1])
+        )
+        for start in range(0, len(uncached), block_size):
+            block = uncached[start:start + block_size]
+            if use_matrix_product:
+                indices, _ = _block_top_k(self.normalized_features, block, top_n, self.removed_mask)
+                indices = indices.astype(np.int64)
+                # Recompute the kept scores in full precision, as _rank_similar returns them
+                scores = np.einsum('ij,ikj->ik', self.normalized_features[block], self.normalized_features[indices])
+                results = zip(indices, scores)
+            else:
+                results = (self._rank_similar(idx, top_n) for idx in block)
+            
+            for idx, (movie_indices, sim_scores) in zip(block, results):
+                result = (np.array(movie_indices, dtype=np.int64), np.array(sim_scores, dtype=np.float64))
+                for array in result:
+                    array.setflags(write=False)
+                rankings[int(idx)] = result
+                if self.result_cache is not None:
+                    self.result_cache.put((int(idx), int(top_n), self.model_version), result)
+        
+        output = []
+        for seed, idx in zip(seeds, positions):
+            if idx is None:
+                output.append({'seed': seed, 'error': 'not_found'})
+                continue
+            output.append({
+                'seed': seed,
+                'movie_id': idx,
+                'title': self.movies_df['title'].iloc[idx],
+                'recommendations': self._recommendation_frame(*rankings[idx])
+            })
+        
+        return output
+    
+    def recommend_from_seeds(self, movie_ids, weights=None, top_n=10, method='centroid', filters=None):
+        """
+        Multi-Seed Service: Recommends movies similar to a set of liked movies.
         
-        # Get the pairwise similarity scores for all movies with the target movie
-        sim_scores = list(enumerate(self.cosine_sim[idx]))
+        All seeds are scored against the catalog in one pass (one product with
+        the embedding store or the normalized features, or one weighted sum of
+        dense similarity rows) and their scores are fused with one of:
         
-        # Sort the movies based on the similarity scores
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+        - 'centroid': cosine similarity to the weighted centroid of the seeds
+        - 'max': similarity to the closest seed, each seed's similarities
+          scaled by its weight relative to the largest weight
         
-        # Get the top N most similar movies (excluding the input movie)
-        sim_scores = sim_scores[1:top_n+1]
+        The seeds themselves and removed movies are never recommended. With a
+        quantized embedding store the best candidates are rescored in full
+        precision, as in recommendation_service().
+        
+        Parameters:
+        -----------
+        movie_ids : array-like of int
+            Row positions of the seed movies
+        weights : array-like of float, optional
+            Non-negative weight of each seed. Defaults to equal weights.
+        top_n : int, default=10
+            Number of recommendations to return
+        method : {'centroid', 'max'}, default='centroid'
+            How the similarities to the individual seeds are combined
+        filters : dict, optional
+            Filters on the recommended movies (see FilterIndex)
+            
+        Returns:
+        --------
+        pandas.DataFrame
+            The recommended movies with their fused similarity scores
+        """
+        if self.cosine_sim is None and self.normalized_features is None and self.embedding_store is None:
+            print("Similarity matrix not found. Computing...")
+            self.similarity_engine()
+        if method not in ('centroid', 'max'):
+            raise ValueError(f"Unknown fusion method: '{method}'")
+        
+        seeds = np.asarray(movie_ids, dtype=np.int64).ravel()
+        if len(seeds) == 0:
+            raise ValueError("At least one seed movie is required.")
+        if seeds.min() < 0 or seeds.max() >= len(self.movies_df) or (
+                self.removed_mask is not None and self.removed_mask[seeds].any()):
+            raise ValueError("Seed movie ids must be positions of movies in the catalog.")
+        weights = np.ones(len(seeds)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        if len(weights) != len(seeds) or not (weights >= 0).all() or not weights.sum() > 0:
+            raise ValueError("Expected one non-negative weight per seed, not all zero.")
+        weights = weights / weights.max()
+        _, allowed = self._compile_filters(filters)
+        
+        if self.embedding_store is not None:
+            seed_vectors = np.stack([self.embedding_store.vector(idx) for idx in seeds])
+            sim_scores = self._fuse_seed_scores(self.embedding_store.score, seed_vectors, weights, method)
+        elif self.normalized_features is not None:
+            sim_scores = self._fuse_seed_scores(
+                lambda query: self.normalized_features @ query, self.normalized_features[seeds], weights, method
+            )
+        else:
+            # Dot products with the centroid are weighted sums of the seeds' similarity rows
+            seed_rows = np.asarray(self.cosine_sim[seeds], dtype=np.float64)
+            if method == 'centroid':
+                centroid_norm = np.sqrt(max(weights @ seed_rows[:, seeds] @ weights, 0))
+                sim_scores = weights @ seed_rows / (centroid_norm if centroid_norm > 0 else 1)
+            else:
+                sim_scores = (weights[:, None] * seed_rows).max(axis=0)
+        
+        excluded = np.zeros(len(sim_scores), dtype=bool)
+        excluded[seeds] = True
+        if self.removed_mask is not None:
+            excluded |= self.removed_mask
+        if allowed is not None:
+            excluded |= ~allowed
+        sim_scores[excluded] = -np.inf
+        
+        if self.embedding_store is not None and self.rerank_candidates:
+            # Rescore the best quantized candidates in full precision, in position order
+            candidates = np.sort(self._top_k(sim_scores, max(self.rerank_candidates, top_n)))
+            candidate_features = normalize(self.reduced_features[candidates])
+            exact_scores = self._fuse_seed_scores(
+                lambda query: candidate_features @ query, normalize(self.reduced_features[seeds]), weights, method
+            )
+            exact_scores[excluded[candidates]] = -np.inf
+            order = self._top_k(exact_scores, top_n)
+            movie_indices, sim_scores = candidates[order], exact_scores[order]
+        else:
+            movie_indices = self._top_k(sim_scores, top_n)
+            sim_scores = sim_scores[movie_indices]
+        
+        # Small catalogs and selective filters may leave fewer than top_n movies
+        kept = np.isfinite(sim_scores)
+        return self._recommendation_frame(movie_indices[kept], sim_scores[kept])
+    
+    @staticmethod
+    def _fuse_seed_scores(score, seed_vectors, weights, method):
+        """
+        Score the catalog against a set of seed vectors and fuse the scores.
         
-        # Get the movie indices
-        movie_indices = [i[0] for i in sim_scores]
+        Parameters:
+        -----------
+        score : callable
+            Maps a query vector of dimension d, or a (d, n_queries) matrix, to
+            the dot products of every catalog vector with the queries
+        seed_vectors : numpy.ndarray
+            L2-normalized seed vectors of shape (n_seeds, d)
+        weights : numpy.ndarray
+            Seed weights scaled so that the largest is 1
+        method : {'centroid', 'max'}
+            The fusion method (see recommend_from_seeds)
+            
+        Returns:
+        --------
+        numpy.ndarray
+            The fused score of every catalog vector
+        """
+        if method == 'centroid':
+            centroid = weights @ seed_vectors
+            centroid_norm = np.linalg.norm(centroid)
+            return score(centroid / centroid_norm if centroid_norm > 0 else centroid)
+        return (score(seed_vectors.T) * weights).max(axis=1)
+    
+    def batch_recommendations(self, output_path, movie_ids=None, top_n=10, output_format=None,
+                              chunk_size=1024, n_jobs=-1):
+        """
+        Batch Recommendation Job: Generates top-N recommendations for many movies offline.
         
-        # Create a dataframe with the recommended movies and their similarity scores
-        recommendations = self.movies_df.iloc[movie_indices].copy()
+        Movies are processed in chunks. Each chunk is scored with one blocked
+        matrix product on a joblib worker pool (or sliced from the neighbor table
+        when one is available) and its results are appended to the output file
+        before the next chunk is collected, so memory stays bounded by chunk_size.
         
-        # Add similarity scores to the dataframe
-        recommendations['similarity_score'] = [i[1] for i in sim_scores]
+        Parameters:
+        -----------
+        output_path : str
+            File to write. Rows are (movie_id, title, rank, recommended_movie_id,
+            recommended_title, similarity_score).
+        movie_ids : array-like of int, optional
+            Row positions of the movies to process. Defaults to the whole catalog.
+        top_n : int, default=10
+            Number of recommendations per movie
+        output_format : {'csv', 'jsonl', 'parquet'}, optional
+            Output format. Inferred from the output_path extension if omitted.
+            Parquet requires pyarrow.
+        chunk_size : int, default=1024
+            Number of movies scored per task
+        n_jobs : int, default=-1
+            Number of worker processes (-1 uses all cores)
+            
+        Returns:
+        --------
+        dict
+            A summary with the number of movies and rows written, the elapsed
+            seconds and the throughput in movies per second
+        """
+        if output_format is None:
+            output_format = os.path.splitext(output_path)[1].lstrip('.').lower()
+        if output_format not in ('csv', 'jsonl', 'parquet'):
+            raise ValueError(f"Unsupported output format: '{output_format}'")
+        
+        if movie_ids is None:
+            movie_ids = np.arange(len(self.movies_df))
+            if self.removed_mask is not None:
+                movie_ids = movie_ids[~self.removed_mask]
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        chunks = [movie_ids[start:start + chunk_size] for start in range(0, len(movie_ids), chunk_size)]
+        
+        if self.similarity_mode == 'neighbors' and top_n <= self.neighbor_indices.shape[1]:
+            results = ((self.neighbor_indices[chunk, :top_n], self.neighbor_scores[chunk, :top_n]) for chunk in chunks)
+        else:
+            features = self.normalized_features
+            if features is None:
+                features = normalize(self.reduced_features)
+            
+            # Results are yielded in order as workers finish, so writing overlaps scoring
+            results = Parallel(n_jobs=n_jobs, return_as='generator')(
+                delayed(_block_top_k)(features, chunk, top_n, self.removed_mask) for chunk in chunks
+            )
         
-        # Return recommended movies with relevant information
-        return idx, recommendations[['title', 'genre_names', 'vote_average', 
-                                   'release_date', 'similarity_score', 'overview']]
+        if output_format == 'parquet':
+            # Parquet support is optional
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        
+        print(f"Generating top {top_n} recommendations for {len(movie_ids)} movies...")
+        titles = self.movies_df['title'].to_numpy()
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        f = open(output_path, 'w', newline='') if output_format != 'parquet' else None
+        parquet_writer = None
+        n_movies = n_rows = 0
+        start_time = time.perf_counter()
+        try:
+            for chunk, (indices, scores) in zip(chunks, results):
+                width = indices.shape[1]
+                recommended = indices.ravel()
+                batch = pd.DataFrame({
+                    'movie_id': np.repeat(chunk, width),
+                    'title': np.repeat(titles[chunk], width),
+                    'rank': np.tile(np.arange(1, width + 1), len(chunk)),
+                    'recommended_movie_id': recommended,
+                    'recommended_title': titles[recommended],
+                    'similarity_score': scores.ravel()
+                })
+                
+                if output_format == 'csv':
+                    batch.to_csv(f, header=n_rows == 0, index=False)
+                elif output_format == 'jsonl':
+                    f.write(batch.to_json(orient='records', lines=True).rstrip('\n') + '\n')
+                else:
+                    table = pa.Table.from_pandas(batch, preserve_index=False)
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                    parquet_writer.write_table(table)
+                
+                n_movies += len(chunk)
+                n_rows += len(batch)
+                elapsed = time.perf_counter() - start_time
+                print(f"Processed {n_movies}/{len(movie_ids)} movies ({n_movies / elapsed:.0f} movies/s)")
+        finally:
+            if f is not None:
+                f.close()
+            if parquet_writer is not None:
+                parquet_writer.close()
+        
+        elapsed = time.perf_counter() - start_time
+        summary = {
+            'movies': int(len(movie_ids)),
+            'rows': int(n_rows),
+            'seconds': elapsed,
+            'movies_per_second': len(movie_ids) / elapsed if elapsed > 0 else float('inf'),
+            'output_path': output_path
+        }
+        print(f"Wrote {n_rows} recommendations to {output_path} "
+              f"in {elapsed:.1f}s ({summary['movies_per_second']:.0f} movies/s).")
+        return summary
     
-    def evaluation_framework(self, recommendations, input_idx):
+    @_profiled('evaluation_framework')
+    def evaluation_framework(self, recommendations, input_idx, recommendation_indices=None):
         """
         Evaluation Framework: Calculates and reports performance metrics.
         
+        All metrics are computed as batched sparse/array operations over the
+        recommended rows, using the genre matrices fitted during preprocessing.
+        
         Parameters:
         -----------
         recommendations : pandas.DataFrame
             The dataframe of recommended movies
         input_idx : int
             The index of the input movie
+        recommendation_indices : array-like of int, optional
+            Row positions of the recommended movies. Defaults to the index of
+            recommendations, as returned by recommendation_service.
             
         Returns:
         --------
         dict
             A dictionary of evaluation metrics
         """
-        # Get the genres of the input movie
-        input_genres = self.movies_df.loc[input_idx, 'genre_names']
-        
-        # Calculate genre overlap
-        genre_matches = []
-        for _, row in recommendations.iterrows():
-            rec_genres = row['genre_names']
-            overlap = len(set(input_genres) & set(rec_genres)) / len(set(input_genres) | set(rec_genres)) if set(input_genres) | set(rec_genres) else 0
-            genre_matches.append(overlap)
-        
-        avg_genre_overlap = sum(genre_matches) / len(genre_matches) if genre_matches else 0
-        avg_genre_overlap = avg_genre_overlap * 100  # Convert to percentage
+        if recommendation_indices is None:
+            recommendation_indices = recommendations.index
+        recommendation_indices = np.asarray(recommendation_indices, dtype=np.int64)
+        
+        if len(recommendation_indices) == 0:
+            return {
+                'average_genre_overlap': 0,
+                'average_rating_difference': 0,
+                'average_content_relevance': 0
+            }
+        
+        genres_sparse, genre_tfidf_matrix = self._evaluation_features()
+        
+        # Calculate genre overlap (Jaccard similarity of the binary genre rows)
+        input_genres = genres_sparse[input_idx]
+        rec_genres = genres_sparse[recommendation_indices]
+        intersection = (rec_genres @ input_genres.T).toarray().ravel()
+        union = np.asarray(rec_genres.sum(axis=1)).ravel() + input_genres.sum() - intersection
+        genre_matches = np.divide(intersection, union, out=np.zeros(len(union)), where=union > 0)
+        avg_genre_overlap = genre_matches.mean() * 100  # Convert to percentage
         
         # Calculate rating similarity
-        input_rating = self.movies_df.loc[input_idx, 'vote_average']
-        rating_diffs = []
-        for _, row in recommendations.iterrows():
-            rec_rating = row['vote_average']
-            if pd.notna(rec_rating) and pd.notna(input_rating):
-                diff = abs(float(rec_rating) - float(input_rating))
-                rating_diffs.append(diff)
+        input_rating = pd.to_numeric(self.movies_df['vote_average'].iloc[input_idx], errors='coerce')
+        rec_ratings = pd.to_numeric(recommendations['vote_average'], errors='coerce').to_numpy(dtype=float)
+        rating_diffs = np.abs(rec_ratings - input_rating)
+        rating_diffs = rating_diffs[~np.isnan(rating_diffs)]
+        avg_rating_diff = rating_diffs.mean() if len(rating_diffs) else 0
         
-        avg_rating_diff = sum(rating_diffs) / len(rating_diffs) if rating_diffs else 0
+        # Compute Content Relevance as the cosine similarity of the genre TF-IDF rows,
+        # which are already L2-normalized
+        content_similarities = (genre_tfidf_matrix[recommendation_indices] @ genre_tfidf_matrix[input_idx].T)
+        avg_content_relevance = content_similarities.toarray().mean() * 100  # Convert to percentage
+        
+        # Return evaluation metrics
+        return {
+            'average_genre_overlap': float(avg_genre_overlap),
+            'average_rating_difference': float(avg_rating_diff),
+            'average_content_relevance': float(avg_content_relevance)
+        }
+    
+    def _evaluation_features(self):
+        """
+        Return the binary genre matrix and genre TF-IDF matrix used for evaluation.
         
-        # Compute Content Relevance using TF-IDF + Cosine Similarity based on genres
-        tfidf = TfidfVectorizer(stop_words='english')
+        Both are normally fitted by preprocessing_pipeline or loaded from an
+        artifact; they are fitted here only if missing.
         
-        # Create genre features text if not already created
-        if 'genre_features' not in self.movies_df.columns:
-            self.movies_df['genre_features'] = self.movies_df['genre_names'].apply(
-                lambda genres: ' '.join(genres) if isinstance(genres, list) else ''
+        Returns:
+        --------
+        tuple
+            A tuple containing (genres_sparse, genre_tfidf_matrix)
+        """
+        if self.genres_sparse is None:
+            self.genres_sparse = MultiLabelBinarizer(sparse_output=True).fit_transform(
+                self.movies_df['genre_names']
+            ).tocsr()
+        
+        if self.genre_tfidf_matrix is None:
+            # Create genre features text if not already created
+            if 'genre_features' not in self.movies_df.columns:
+                self.movies_df['genre_features'] = self.movies_df['genre_names'].apply(
+                    lambda genres: ' '.join(genres) if isinstance(genres, list) else ''
+                )
+            self.genre_tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(
+                self.movies_df['genre_features']
             )
         
-        tfidf_matrix = tfidf.fit_transform(self.movies_df['genre_features'])
+        return self.genres_sparse, self.genre_tfidf_matrix
+    
+    def save(self, path):
+        """
+        Persist the fitted model to a directory for fast cold starts.
+        
+        Each computed array is written as an uncompressed .npy file so load()
+        can memory-map it, the display columns are pickled alongside, and a
+        manifest.json describing the artifact is written last so a partially
+        written directory is never mistaken for a complete one.
+        
+        Parameters:
+        -----------
+        path : str
+            Directory to write the artifact to (created if missing)
+            
+        Returns:
+        --------
+        dict
+            The manifest that was written
+        """
+        if self.movies_df is None or self.reduced_features is None:
+            raise ValueError("The model must be fitted before it can be saved.")
+        
+        print(f"Saving model to {path}...")
+        os.makedirs(path, exist_ok=True)
+        
+        arrays = {}
+        for name in self.ARTIFACT_ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                arrays[name] = f"{name}.npy"
+                np.save(os.path.join(path, arrays[name]), np.ascontiguousarray(array))
+        
+        sparse = {}
+        for name in self.ARTIFACT_SPARSE:
+            matrix = getattr(self, name)
+            if matrix is not None:
+                sparse[name] = f"{name}.npz"
+                save_npz(os.path.join(path, sparse[name]), csr_matrix(matrix))
+        
+        columns = [column for column in self.DISPLAY_COLUMNS if column in self.movies_df.columns]
+        self.movies_df[columns].to_pickle(os.path.join(path, 'movies.pkl'))
+        
+        manifest = {
+            'format_version': self.ARTIFACT_FORMAT_VERSION,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_version': self.model_version,
+            'similarity_mode': self.similarity_mode,
+            'n_movies': len(self.movies_df),
+            'n_components': int(self.reduced_features.shape[1]),
+            'arrays': arrays,
+            'sparse': sparse,
+            'movies': 'movies.pkl',
+            'columns': columns
+        }
+        
+        # Only the built-in IVF backend knows how to serialize itself
+        if isinstance(self.ann_backend, IVFIndex):
+            ann_arrays = {}
+            for name, array in self.ann_backend.to_arrays().items():
+                ann_arrays[name] = f"ann_{name}.npy"
+                np.save(os.path.join(path, ann_arrays[name]), array)
+            manifest['ann'] = {'type': 'ivf', 'n_probe': self.ann_backend.n_probe, 'arrays': ann_arrays}
+        elif self.ann_backend is not None:
+            print(f"{type(self.ann_backend).__name__} cannot be persisted; it will need to be rebuilt after loading.")
+            manifest['similarity_mode'] = 'on_demand'
+        
+        if self.embedding_store is not None:
+            store_arrays = {}
+            for name, array in self.embedding_store.to_arrays().items():
+                store_arrays[name] = f"embedding_{name}.npy"
+                np.save(os.path.join(path, store_arrays[name]), array)
+            manifest['embedding_store'] = {
+                'precision': self.embedding_store.precision,
+                'rerank_candidates': self.rerank_candidates,
+                'arrays': store_arrays
+            }
+        
+        if self.collaborative_features is not None:
+            manifest['hybrid'] = {
+                'collaborative_weight': self.collaborative_weight,
+                'n_candidates': self.hybrid_candidates
+            }
+        
+        # The fitted transformers let a loaded model accept add_movies()
+        if self.transformers:
+            manifest['transformers'] = 'transformers.joblib'
+            joblib.dump(self.transformers, os.path.join(path, manifest['transformers']))
+        
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        print("Model saved.")
+        return manifest
+    
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a model written by save().
+        
+        Parameters:
+        -----------
+        path : str
+            Directory containing the artifact
+        mmap : bool, default=True
+            If True, arrays are memory-mapped read-only so that processes
+            loading the same artifact share pages instead of copying them
+            
+        Returns:
+        --------
+        MovieRecommendationSystem
+            A recommendation system ready to serve queries
+        """
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
         
-        input_vector = tfidf_matrix[input_idx]
-        content_similarities = []
+        if manifest.get('format_version') != cls.ARTIFACT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported artifact format version {manifest.get('format_version')} "
+                f"(expected {cls.ARTIFACT_FORMAT_VERSION})"
+            )
         
-        for _, row in recommendations.iterrows():
-            rec_idx = self.movies_df[
-                (self.movies_df['title'] == row['title']) & 
-                (self.movies_df['release_date'] == row['release_date'])
-            ].index[0]
+        system = cls()
+        with system.profiler.stage('load', mmap=mmap) as stage:
+            mmap_mode = 'r' if mmap else None
+            for name, filename in manifest['arrays'].items():
+                if name in cls.ARTIFACT_ARRAYS:
+                    setattr(system, name, np.load(os.path.join(path, filename), mmap_mode=mmap_mode))
+            
+            for name, filename in manifest.get('sparse', {}).items():
+                if name in cls.ARTIFACT_SPARSE:
+                    setattr(system, name, load_npz(os.path.join(path, filename)).tocsr())
+            
+            if 'ann' in manifest:
+                ann_arrays = {
+                    name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+                    for name, filename in manifest['ann']['arrays'].items()
+                }
+                system.ann_backend = IVFIndex.from_arrays(ann_arrays, n_probe=manifest['ann']['n_probe'])
+            
+            if 'embedding_store' in manifest:
+                store_arrays = {
+                    name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+                    for name, filename in manifest['embedding_store']['arrays'].items()
+                }
+                system.embedding_store = EmbeddingStore.from_arrays(store_arrays, manifest['embedding_store']['precision'])
+                system.rerank_candidates = manifest['embedding_store']['rerank_candidates']
             
-            rec_vector = tfidf_matrix[rec_idx]
-            similarity = cosine_similarity(input_vector, rec_vector)[0][0]
-            content_similarities.append(similarity)
+            if 'hybrid' in manifest:
+                system.collaborative_weight = manifest['hybrid']['collaborative_weight']
+                system.hybrid_candidates = manifest['hybrid']['n_candidates']
+            
+            if 'transformers' in manifest:
+                system.transformers = joblib.load(os.path.join(path, manifest['transformers']))
+            
+            system.movies_df = pd.read_pickle(os.path.join(path, manifest['movies']))
+            system.similarity_mode = manifest['similarity_mode']
+            system.model_version = manifest.get('model_version') or manifest['created_at']
+            system._build_title_index()
+            
+            stage['n_movies'] = len(system.movies_df)
+        
+        print(f"Loaded model with {manifest['n_movies']} movies from {path}.")
+        return system
+    
+    def prepare_for_serving(self):
+        """
+        Build every lazily-created structure up front.
         
-        avg_content_relevance = sum(content_similarities) / len(content_similarities) if content_similarities else 0
-        avg_content_relevance = avg_content_relevance * 100  # Convert to percentage
+        The title index, the title search and filter indexes and the evaluation
+        features are otherwise created on first use. Building them before a server forks
+        its workers lets the workers share them copy-on-write and keeps the
+        model read-only while requests are served from several threads.
         
-        # Return evaluation metrics
-        return {
-            'average_genre_overlap': avg_genre_overlap,
-            'average_rating_difference': avg_rating_diff,
-            'average_content_relevance': avg_content_relevance
-        }
+        Returns:
+        --------
+        MovieRecommendationSystem
+            The system itself
+        """
+        if self.title_index is None:
+            self._build_title_index()
+        if self.title_search is None:
+            self.title_search = TitleSearchIndex(self.movies_df['title'])
+        if self.filter_index is None:
+            self.filter_index = FilterIndex(self.movies_df)
+        self._evaluation_features()
+        return self
     
     def visualize_recommendations(self, recommendations, title):
         """
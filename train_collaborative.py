@@ -0,0 +1,81 @@
+"""
+Description: Collaborative Filtering Training Job
+
+
+This script trains the implicit-feedback ALS model on the MovieLens ratings file
+(ratings.csv, ~26M ratings) and saves it for serving, printing the time and memory
+used by each stage.
+
+Example:
+    python train_collaborative.py --ratings-path ratings.csv --links-path links.csv
+"""
+
+import argparse
+import json
+import os
+
+# Import the collaborative filtering model
+from movie_recommendation_system import CollaborativeFilteringModel
+
+def run_training_job(ratings_path='ratings.csv', links_path=None, artifact_path='cf_artifact',
+                     factors=64, iterations=15, alpha=10.0, regularization=0.05, n_jobs=-1,
+                     chunksize=1000000):
+    """
+    Train the collaborative filtering model and save it to artifact_path.
+
+    Parameters:
+    -----------
+    ratings_path : str, default='ratings.csv'
+        Path to the ratings CSV file (userId, movieId, rating, timestamp)
+    links_path : str, optional
+        Path to the links CSV file mapping MovieLens movie ids to TMDB ids
+    artifact_path : str, default='cf_artifact'
+        Directory to save the trained model to
+    factors : int, default=64
+        Number of latent factors
+    iterations : int, default=15
+        Number of ALS iterations
+    alpha : float, default=10.0
+        Confidence scale of a rating
+    regularization : float, default=0.05
+        L2 regularization of the factors
+    n_jobs : int, default=-1
+        Number of solver threads (-1 uses all cores)
+    chunksize : int, default=1000000
+        Number of ratings parsed at a time
+
+    Returns:
+    --------
+    dict
+        The load and training reports
+    """
+    model = CollaborativeFilteringModel(factors=factors, iterations=iterations, alpha=alpha,
+                                        regularization=regularization, n_jobs=n_jobs)
+    model.load_ratings(ratings_path, chunksize=chunksize)
+    if links_path is not None and os.path.exists(links_path):
+        model.load_links(links_path)
+    model.fit()
+    model.save(artifact_path)
+
+    return {'load': model.load_report, 'training': model.training_report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the collaborative filtering model on user ratings.")
+    parser.add_argument('--ratings-path', default='ratings.csv')
+    parser.add_argument('--links-path', default='links.csv')
+    parser.add_argument('--artifact-path', default='cf_artifact')
+    parser.add_argument('--factors', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=15)
+    parser.add_argument('--alpha', type=float, default=10.0)
+    parser.add_argument('--regularization', type=float, default=0.05)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--chunksize', type=int, default=1000000)
+    args = parser.parse_args()
+
+    reports = run_training_job(ratings_path=args.ratings_path, links_path=args.links_path,
+                               artifact_path=args.artifact_path, factors=args.factors,
+                               iterations=args.iterations, alpha=args.alpha,
+                               regularization=args.regularization, n_jobs=args.n_jobs,
+                               chunksize=args.chunksize)
+    print(json.dumps(reports, indent=2))